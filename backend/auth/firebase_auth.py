@@ -1,10 +1,19 @@
 # backend/auth/firebase_auth.py
 
+import hashlib
+import logging
 import os
+import threading
+import time
 import firebase_admin
 from firebase_admin import credentials, auth
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from starlette.concurrency import run_in_threadpool
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
 
 # Carga las credenciales de servicio de Firebase.
 # DEBES descargar este archivo JSON desde tu proyecto de Firebase
@@ -20,14 +29,48 @@ else:
 
 # Este esquema le dice a FastAPI que busque un token en la cabecera "Authorization: Bearer <token>"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+# Variante sin error automático, para rutas que también aceptan el token de hogar (X-Hogar-Token)
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
+
+# Caché de tokens ya verificados: sha256(token) -> claims decodificados.
+# Cada entrada vive como mucho hasta el 'exp' del token (y nunca más de TOKEN_CACHE_MAX_TTL),
+# así que un token caducado nunca se acepta desde la caché.
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "5000"))
+TOKEN_CACHE_MAX_TTL = float(os.getenv("TOKEN_CACHE_MAX_TTL", "3600"))
+token_cache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_MAX_TTL, name="firebase_tokens")
+
+# Refresco en segundo plano de los certificados de Google que firman los ID tokens,
+# para que ninguna petición tenga que esperar a descargarlos.
+CERT_REFRESH_SECONDS = float(os.getenv("FIREBASE_CERT_REFRESH_SECONDS", "1800"))
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
 
-def get_current_user(token: str = Depends(oauth2_scheme)):
+def verify_token_cached(token: str) -> dict | None:
+    """Return cached claims for an already verified token, or None on a miss."""
+    return token_cache.get(_token_key(token))
+
+
+def _verify_and_cache(token: str) -> dict:
+    decoded_token = auth.verify_id_token(token)
+    remaining = decoded_token.get("exp", 0) - time.time()
+    if remaining > 0:
+        token_cache.set(_token_key(token), decoded_token, ttl=min(remaining, TOKEN_CACHE_MAX_TTL))
+    return decoded_token
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     """
     Dependencia de FastAPI para verificar el token de Firebase y obtener los datos del usuario.
+    Los tokens ya verificados se sirven desde caché sin repetir la verificación RSA.
     """
-    try:
-        decoded_token = auth.verify_id_token(token)
+    decoded_token = verify_token_cached(token)
+    if decoded_token is not None:
         return decoded_token
+    try:
+        return await run_in_threadpool(_verify_and_cache, token)
     except auth.InvalidIdTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token inválido")
     except Exception:
@@ -40,4 +83,47 @@ def get_current_user_id(user: dict = Depends(get_current_user)) -> str:
     user_id = user.get("uid")
     if not user_id:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="No se pudo encontrar el ID de usuario en el token")
-    return user_id
\ No newline at end of file
+    return user_id
+
+
+def prefetch_signing_certificates() -> bool:
+    """
+    Descarga los certificados de firma a través del transporte con caché HTTP que usa
+    firebase-admin, de modo que verify_id_token los encuentre ya en caché.
+    """
+    from firebase_admin import _token_gen
+
+    try:
+        request = auth._get_client(firebase_admin.get_app())._token_verifier.request
+        # no-cache fuerza una descarga nueva, que sustituye la entrada cacheada
+        request(_token_gen.ID_TOKEN_CERT_URI, headers={"Cache-Control": "no-cache"})
+        return True
+    except Exception as e:
+        logger.warning(f"No se pudieron precargar los certificados de Firebase: {e}")
+        return False
+
+
+class CertificateRefresher:
+    """Daemon thread that keeps Google's signing certificates warm."""
+
+    def __init__(self, interval: float = CERT_REFRESH_SECONDS):
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self):
+        if not firebase_admin._apps or self._thread is not None:
+            return  # Firebase sin inicializar: no hay nada que precargar
+        self._thread = threading.Thread(target=self._run, name="firebase-cert-refresh", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            prefetch_signing_certificates()
+            self._stop.wait(self.interval)
+
+
+certificate_refresher = CertificateRefresher()
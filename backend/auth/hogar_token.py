@@ -0,0 +1,95 @@
+# backend/auth/hogar_token.py
+"""
+Short-lived household session tokens signed by the server (HMAC-SHA256).
+
+A client exchanges its Firebase ID token for a household token once. It then
+sends it as `X-Hogar-Token`. The token encodes user, household, membership row,
+role and a version number. Validating it needs no Firebase verification and,
+while the membership is cached, no database round-trip. A role change bumps
+`HogarMiembro.token_version`, which revokes previously issued tokens.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import re
+import secrets
+import time
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+HOGAR_TOKEN_TTL = int(os.getenv("HOGAR_TOKEN_TTL", "900"))  # segundos
+
+# Debe ser el mismo en todos los workers/instancias; si falta, cada proceso genera el suyo
+# y los tokens solo valen en el proceso que los emitió.
+_secret = os.getenv("HOGAR_TOKEN_SECRET")
+if not _secret:
+    logger.warning("HOGAR_TOKEN_SECRET no configurado: usando un secreto aleatorio por proceso.")
+    _secret = secrets.token_urlsafe(32)
+_SECRET = _secret.encode("utf-8")
+
+# payload.firma, ambas partes en base64url sin relleno. Las cabeceras llegan decodificadas
+# como latin-1, así que cualquier otro carácter se rechaza antes de firmar o comparar.
+_TOKEN_FORMAT = re.compile(r"[A-Za-z0-9_-]+\.[A-Za-z0-9_-]+")
+
+
+class InvalidHogarToken(Exception):
+    """The token is malformed, has a bad signature or is expired."""
+
+
+@dataclass(frozen=True)
+class HogarTokenClaims:
+    user_id: str
+    hogar_id: int
+    id_miembro: int
+    rol: str
+    version: int
+    expires_at: int
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_SECRET, payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def issue_hogar_token(user_id: str, hogar_id: int, id_miembro: int, rol: str, version: int) -> tuple[str, int]:
+    """Return (token, expires_at) for the given membership."""
+    expires_at = int(time.time()) + HOGAR_TOKEN_TTL
+    claims = {"uid": user_id, "hid": hogar_id, "mid": id_miembro, "rol": rol, "ver": version, "exp": expires_at}
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    return f"{payload}.{_sign(payload)}", expires_at
+
+
+def decode_hogar_token(token: str) -> HogarTokenClaims:
+    """Verify signature and expiry locally. Raises InvalidHogarToken."""
+    if not _TOKEN_FORMAT.fullmatch(token):
+        raise InvalidHogarToken("Formato de token inválido")
+    payload, signature = token.split(".")
+    if not hmac.compare_digest(signature.encode("ascii"), _sign(payload).encode("ascii")):
+        raise InvalidHogarToken("Firma inválida")
+    try:
+        claims = json.loads(_b64decode(payload))
+        decoded = HogarTokenClaims(
+            user_id=claims["uid"],
+            hogar_id=int(claims["hid"]),
+            id_miembro=int(claims["mid"]),
+            rol=claims["rol"],
+            version=int(claims["ver"]),
+            expires_at=int(claims["exp"]),
+        )
+    except (ValueError, KeyError, TypeError):
+        raise InvalidHogarToken("Contenido de token inválido")
+    if decoded.expires_at <= time.time():
+        raise InvalidHogarToken("Token caducado")
+    return decoded
@@ -0,0 +1,121 @@
+# backend/benchmarks/auth_concurrency.py
+"""
+Regression benchmark: throughput of household-scoped requests under concurrency.
+
+Mounts a probe endpoint behind `require_miembro_or_admin_role` and replaces the
+membership queries with a fixed simulated DB latency. It then compares:
+
+- offloaded: the current dependencies (DB work awaited through DBSession.run)
+- blocking:  the previous pattern (sync repository calls inside `async def`)
+
+With blocking dependencies throughput stays flat as concurrency grows, because
+every request serializes on the event loop. Offloaded dependencies should
+scale roughly linearly until the threadpool (40) or the pool size is reached.
+
+Usage (from backend/):
+    python -m benchmarks.auth_concurrency [--latency-ms 20] [--requests 200]
+"""
+import argparse
+import asyncio
+import os
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+import httpx
+from fastapi import Depends, FastAPI, HTTPException
+
+import dependencies
+from auth.firebase_auth import get_current_user_id
+from database import DBSession, get_session
+from repositories.hogar_repository import HogarRepository, membership_cache
+
+HOGAR_ID = 1
+USER_ID = "bench-user"
+
+
+def _install_fake_repository(latency: float):
+    """Replace membership queries with a sleep that mimics a Postgres round-trip."""
+    miembro = SimpleNamespace(
+        user_id=USER_ID, fk_hogar=HOGAR_ID, rol="miembro", id_hogar=HOGAR_ID, id_miembro=1, token_version=0
+    )
+
+    def get_miembro(self, user_id, hogar_id):
+        time.sleep(latency)
+        return miembro
+
+    def get_hogares_by_user(self, user_id):
+        time.sleep(latency)
+        return [miembro]
+
+    HogarRepository.get_miembro = get_miembro
+    HogarRepository.get_hogares_by_user = get_hogares_by_user
+    # Measure the uncached path: every request pays the membership query
+    membership_cache.ttl = 0
+
+
+async def _fake_session():
+    yield DBSession(SimpleNamespace())
+
+
+async def _blocking_role_check(user_id: str = Depends(get_current_user_id)):
+    """Replica of the old dependency chain: sync queries straight on the event loop."""
+    repo = HogarRepository(None)
+    if not repo.user_is_member_of_hogar(user_id, HOGAR_ID):
+        raise HTTPException(status_code=403)
+    miembro = repo.get_miembro(user_id, HOGAR_ID)
+    if miembro.rol == "invitado":
+        raise HTTPException(status_code=403)
+    return HOGAR_ID, user_id
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/offloaded")
+    async def offloaded(auth_data: tuple = Depends(dependencies.require_miembro_or_admin_role)):
+        return {"hogar_id": auth_data[0]}
+
+    @app.get("/blocking")
+    async def blocking(auth_data: tuple = Depends(_blocking_role_check)):
+        return {"hogar_id": auth_data[0]}
+
+    app.dependency_overrides[get_current_user_id] = lambda: USER_ID
+    app.dependency_overrides[dependencies.get_firebase_user_id] = lambda: USER_ID
+    app.dependency_overrides[get_session] = _fake_session
+    return app
+
+
+async def _measure(client: httpx.AsyncClient, path: str, total: int, concurrency: int) -> float:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            response = await client.get(path, headers={"X-Hogar-Id": str(HOGAR_ID)})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    return total / (time.perf_counter() - start)
+
+
+async def main(latency_ms: float, total: int, levels: list[int]):
+    _install_fake_repository(latency_ms / 1000)
+    transport = httpx.ASGITransport(app=build_app())
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"simulated DB latency: {latency_ms} ms/query, {total} requests per run")
+        print(f"{'concurrency':>11} | {'blocking req/s':>14} | {'offloaded req/s':>15} | speedup")
+        for concurrency in levels:
+            blocking = await _measure(client, "/blocking", total, concurrency)
+            offloaded = await _measure(client, "/offloaded", total, concurrency)
+            print(f"{concurrency:>11} | {blocking:>14.1f} | {offloaded:>15.1f} | {offloaded / blocking:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 32])
+    args = parser.parse_args()
+    asyncio.run(main(args.latency_ms, args.requests, args.concurrency))
@@ -0,0 +1,119 @@
+# backend/benchmarks/list_serialization.py
+"""
+Regression benchmark: rows per second of the stock listing, query + serialization.
+
+Seeds an in-memory SQLite household with N stock rows and compares:
+
+- orm:  the previous path (ORM objects with eager-loaded product and location,
+        StockItem per row, then FastAPI's response_model validation and dump)
+- fast: the current path (column tuples, dicts built directly, one orjson dump;
+        see fast_json.py)
+
+SQLite keeps the query cost low, so the difference is mostly object and
+serialization overhead; against Postgres the ORM path also pays for hydrating
+the identity map.
+
+Usage (from backend/):
+    python -m benchmarks.list_serialization [--rows 2000] [--repeat 20]
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine
+from sqlalchemy.orm import contains_eager, joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import fast_json
+from database import Base
+from models import Hogar, InventoryStock, Location, Product
+from schemas import StockItem
+from services.stock_service import StockService
+
+HOGAR_ID = 1
+
+
+def _seed(session, rows: int):
+    session.add(Hogar(id_hogar=HOGAR_ID, nombre="bench", created_by="bench-user", codigo_invitacion="BENCH1"))
+    locations = [Location(nombre=f"Ubicación {i}", hogar_id=HOGAR_ID) for i in range(5)]
+    products = [
+        Product(nombre=f"Producto {i}", marca="Marca", barcode=f"84{i:011d}", hogar_id=HOGAR_ID)
+        for i in range(max(rows // 4, 1))
+    ]
+    session.add_all(locations + products)
+    session.flush()
+    today = date.today()
+    session.add_all(
+        InventoryStock(
+            hogar_id=HOGAR_ID,
+            fk_producto_maestro=products[i % len(products)].id_producto,
+            fk_ubicacion=locations[i % len(locations)].id_ubicacion,
+            cantidad_actual=1 + i % 7,
+            fecha_caducidad=today + timedelta(days=i),
+            estado_producto=("cerrado", "abierto", "congelado")[i % 3],
+        )
+        for i in range(rows)
+    )
+    session.commit()
+
+
+_stock_list_adapter = TypeAdapter(list[StockItem])
+
+
+def orm_path(session) -> bytes:
+    """Replica of the previous listing: ORM graph, model per row, response_model validation."""
+    items = (
+        session.query(InventoryStock)
+        .join(Product)
+        .options(contains_eager(InventoryStock.producto_maestro), joinedload(InventoryStock.ubicacion))
+        .filter(InventoryStock.hogar_id == HOGAR_ID)
+        .order_by(Product.nombre, InventoryStock.fecha_caducidad, InventoryStock.id_stock)
+        .all()
+    )
+    response = [StockItem.model_validate(item) for item in items]
+    return _stock_list_adapter.dump_json(_stock_list_adapter.validate_python(response))
+
+
+def fast_path(session) -> bytes:
+    return fast_json.dumps(StockService(session).get_stock_for_hogar(HOGAR_ID, None))
+
+
+def _measure(fn, session, repeat: int) -> float:
+    """Best time of `repeat` runs, with a fresh identity map each time."""
+    best = float("inf")
+    for _ in range(repeat):
+        session.expunge_all()
+        start = time.perf_counter()
+        fn(session)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(rows: int, repeat: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    _seed(session, rows)
+
+    assert json.loads(orm_path(session)) == json.loads(fast_path(session)), "los dos caminos deben dar el mismo JSON"
+
+    orm = _measure(orm_path, session, repeat)
+    fast = _measure(fast_path, session, repeat)
+    print(f"{rows} stock rows, best of {repeat}")
+    print(f"{'path':>5} | {'ms/request':>10} | {'rows/s':>10}")
+    print(f"{'orm':>5} | {orm * 1000:>10.1f} | {rows / orm:>10.0f}")
+    print(f"{'fast':>5} | {fast * 1000:>10.1f} | {rows / fast:>10.0f}")
+    print(f"speedup: {orm / fast:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    main(args.rows, args.repeat)
@@ -0,0 +1,106 @@
+# backend/benchmarks/notification_cron.py
+"""
+Load test of the hourly notification cron, offline.
+
+Seeds an in-memory SQLite database with N users due this hour (one household
+each, with an expiring product and one or more devices), runs
+NotificationService.trigger_daily_notifications (enqueue) and then drain_outbox
+(delivery) against push.FakeTransport, which simulates the FCM latency of each
+send_each batch. Some tokens are marked unregistered/invalid so error handling
+is exercised too.
+
+Compare the current delivery (batches of up to 500 from a worker pool) with
+the previous one-request-per-device loop by setting --batch-size 1 --workers 1.
+
+Usage (from backend/):
+    python -m benchmarks.notification_cron [--users 5000] [--devices 2] [--latency-ms 50]
+        [--batch-size 500] [--workers 4]
+"""
+import argparse
+import os
+import time
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite:///:memory:")
+
+from sqlalchemy import create_engine, event, insert
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import push
+from database import Base
+from models import Hogar, HogarMiembro, InventoryStock, Location, Product, UserDevice, UserPreference
+from services.notification_service import NotificationService
+
+
+def _seed(session, users: int, devices: int):
+    minute = datetime.utcnow().hour * 60
+    expiry = date.today() + timedelta(days=1)
+    session.execute(insert(Hogar), [
+        {"id_hogar": i, "nombre": f"Hogar {i}", "created_by": f"user-{i}", "codigo_invitacion": f"B{i:07d}"}
+        for i in range(1, users + 1)
+    ])
+    session.execute(insert(HogarMiembro), [
+        {"fk_hogar": i, "user_id": f"user-{i}", "rol": "admin"} for i in range(1, users + 1)
+    ])
+    session.execute(insert(Location), [
+        {"id_ubicacion": i, "nombre": "Nevera", "hogar_id": i} for i in range(1, users + 1)
+    ])
+    session.execute(insert(Product), [
+        {"id_producto": i, "nombre": "Leche", "hogar_id": i} for i in range(1, users + 1)
+    ])
+    session.execute(insert(InventoryStock), [
+        {"hogar_id": i, "fk_producto_maestro": i, "fk_ubicacion": i, "cantidad_actual": 1,
+         "fecha_caducidad": expiry, "estado_producto": "cerrado"}
+        for i in range(1, users + 1)
+    ])
+    session.execute(insert(UserPreference), [
+        {"user_id": f"user-{i}", "notifications_enabled": True, "notification_time": "09:00:00",
+         "timezone_offset": 0, "notification_utc_minute": minute}
+        for i in range(1, users + 1)
+    ])
+    # 1 de cada 50 tokens caducado y 1 de cada 200 inválido
+    session.execute(insert(UserDevice), [
+        {"user_id": f"user-{i}", "platform": "android",
+         "fcm_token": ("unregistered" if n % 50 == 0 else "invalid" if n % 200 == 1 else "token") + f"-{n}"}
+        for n, i in enumerate((i for i in range(1, users + 1) for _ in range(devices)))
+    ])
+    session.commit()
+
+
+def main(users: int, devices: int, latency_ms: float, batch_size: int, workers: int):
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    session = sessionmaker(bind=engine, autoflush=False)()
+    _seed(session, users, devices)
+
+    push.FCM_BATCH_SIZE = max(batch_size, 1)
+    push.FCM_MAX_WORKERS = max(workers, 1)
+    transport = push.FakeTransport(latency_ms)
+    queries = []
+    event.listen(engine, "before_cursor_execute", lambda *args: queries.append(1))
+    service = NotificationService(session, transport)
+    start = time.perf_counter()
+    enqueued = service.trigger_daily_notifications()
+    enqueue_elapsed = time.perf_counter() - start
+    enqueue_queries = len(queries)
+    result = service.drain_outbox()
+    elapsed = time.perf_counter() - start
+
+    print(f"{users} users x {devices} devices, {latency_ms:.0f} ms per FCM call, "
+          f"batch {push.FCM_BATCH_SIZE}, {push.FCM_MAX_WORKERS} workers")
+    print(f"enqueue: {enqueued['enqueued']} users, {enqueue_queries} queries, {enqueue_elapsed:.2f} s")
+    print(f"drain: {result['messages_sent']} messages sent, errors {result['errors']}, "
+          f"devices pruned {result['devices_pruned']}, {result['batches']} batches, {len(queries) - enqueue_queries} queries")
+    print(f"{transport.batches} FCM calls, {elapsed:.2f} s total, {transport.sent / elapsed:.0f} messages/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=5000)
+    parser.add_argument("--devices", type=int, default=2)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--batch-size", type=int, default=push.FCM_BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=push.FCM_MAX_WORKERS)
+    args = parser.parse_args()
+    main(args.users, args.devices, args.latency_ms, args.batch_size, args.workers)
@@ -0,0 +1,112 @@
+# backend/change_tracking.py
+"""
+Per-household change version and change log.
+
+Every committed transaction that writes household data bumps `Hogar.version`
+once and appends one `HogarCambio` row per changed entity, tagged with the new
+version. Read endpoints derive their ETag from the version (see http_cache.py),
+the delta sync endpoint reads the log and connected clients get a push event
+(see realtime.py).
+
+The version UPDATE runs at the end of the transaction and locks the household
+row until commit, so concurrent writers of a household commit in version order
+and a reader never sees version N before the log rows of N.
+
+ORM writes to the tracked models are captured automatically at flush time.
+Core statements that bypass the unit of work (e.g. the stock upsert) must call
+`record_change` explicitly.
+"""
+from typing import Callable
+
+from sqlalchemy import event, insert, inspect, update
+from sqlalchemy.orm import Session
+
+from models import Hogar, HogarCambio, InventoryStock, Location, Product, ShoppingListItem
+from realtime import emit_change_event
+
+# Models whose rows belong to a household (all have a hogar_id column) -> change log entity name
+TRACKED_MODELS = {
+    InventoryStock: 'stock',
+    Location: 'ubicacion',
+    Product: 'producto',
+    ShoppingListItem: 'lista_compra',
+}
+
+_PENDING_KEY = "hogar_changes"
+_COMMITTED_KEY = "hogar_changed_ids"
+
+# Callbacks run in this process after a commit that changed a household (e.g. local cache invalidation)
+_change_callbacks: list[Callable[[int], None]] = []
+
+
+def record_change(db: Session, hogar_id: int, entidad: str, entidad_id: int, operacion: str = 'upsert'):
+    """Record a change in this transaction; it is logged (and the version bumped) on commit."""
+    changes = db.info.setdefault(_PENDING_KEY, {}).setdefault(hogar_id, {})
+    changes[(entidad, entidad_id)] = operacion  # last operation in the transaction wins
+
+
+def on_hogar_changed(callback: Callable[[int], None]) -> Callable[[int], None]:
+    """
+    Register `callback(hogar_id)` to run after each commit that bumped the household version.
+    Only commits made by this worker trigger it; other workers must compare versions.
+    """
+    _change_callbacks.append(callback)
+    return callback
+
+
+@event.listens_for(Session, "after_flush")
+def _capture_changes(session: Session, flush_context):
+    # new/dirty/deleted and attribute history still show the pre-flush state here;
+    # new rows already have their primary key, but not yet an identity key
+    for objects, operacion in ((session.new, 'upsert'), (session.dirty, 'upsert'), (session.deleted, 'delete')):
+        for obj in objects:
+            entidad = TRACKED_MODELS.get(type(obj))
+            if entidad is None or obj.hogar_id is None:
+                continue
+            if objects is session.dirty and not session.is_modified(obj):
+                continue
+            record_change(session, obj.hogar_id, entidad, inspect(obj).mapper.primary_key_from_instance(obj)[0], operacion)
+
+
+@event.listens_for(Session, "before_commit")
+def _write_changes(session: Session):
+    # commit() only flushes after this hook runs; flush now so pending objects are captured
+    session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+    for hogar_id in sorted(pending):  # fixed lock order across households
+        version = session.execute(
+            update(Hogar)
+            .where(Hogar.id_hogar == hogar_id)
+            .values(version=Hogar.version + 1)
+            .returning(Hogar.version)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if version is None:
+            continue  # household deleted in this transaction
+        session.info.setdefault(_COMMITTED_KEY, set()).add(hogar_id)
+        session.execute(insert(HogarCambio), [
+            {
+                "hogar_id": hogar_id,
+                "version": version,
+                "entidad": entidad,
+                "entidad_id": entidad_id,
+                "operacion": operacion,
+            }
+            for (entidad, entidad_id), operacion in pending[hogar_id].items()
+        ])
+        emit_change_event(session, hogar_id, version, pending[hogar_id])
+
+
+@event.listens_for(Session, "after_commit")
+def _notify_changes(session: Session):
+    for hogar_id in session.info.pop(_COMMITTED_KEY, ()):
+        for callback in _change_callbacks:
+            callback(hogar_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop(_PENDING_KEY, None)
+    session.info.pop(_COMMITTED_KEY, None)
@@ -1,150 +1,253 @@
 # backend/dependencies.py
 """FastAPI dependencies for authentication and authorization."""
 
+import logging
 from fastapi import Header, HTTPException, Depends, status
-from sqlalchemy.orm import Session
 from typing import Tuple
 
-from auth.firebase_auth import get_current_user_id
-from database import get_db
-from repositories.hogar_repository import HogarRepository
+from auth.firebase_auth import get_current_user, get_current_user_id, optional_oauth2_scheme
+from auth.hogar_token import InvalidHogarToken, decode_hogar_token
+from database import DBSession, get_session
+from repositories.hogar_repository import HogarRepository, MembershipInfo
 
+logger = logging.getLogger(__name__)
 
-async def get_active_hogar_id(
-    x_hogar_id: int | None = Header(None, alias="X-Hogar-Id", description="Active household ID (optional - uses first household if not provided)"),
-    user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
-) -> int:
+
+async def get_firebase_user_id(
+    x_hogar_token: str | None = Header(None, alias="X-Hogar-Token"),
+    token: str | None = Depends(optional_oauth2_scheme)
+) -> str | None:
     """
-    Verify that the user has access to the requested household.
-    
-    This dependency:
-    1. Reads the X-Hogar-Id header from the request (optional)
-    2. If not provided, uses the user's first household
-    3. Verifies the user is authenticated (via get_current_user_id)
-    4. Checks that the user is a member of the household
-    
-    Args:
-        x_hogar_id: Household ID from request header (optional)
-        user_id: Authenticated user ID (from Firebase token)
-        db: Database session
-    
+    Verify the Firebase ID token, unless the request carries a household token.
+
+    Requests authenticated with X-Hogar-Token skip Firebase verification
+    entirely; the household token is validated by get_active_membership.
+
     Returns:
-        The household ID if user has access
-    
+        The Firebase UID, or None when X-Hogar-Token is present
+
+    Raises:
+        HTTPException 401: If neither token is provided or the Firebase token is invalid
+    """
+    if x_hogar_token:
+        return None
+    if not token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"}
+        )
+    return get_current_user_id(await get_current_user(token))
+
+
+async def resolve_membership(
+    user_id: str,
+    hogar_id: int | None,
+    db: DBSession
+) -> MembershipInfo:
+    """
+    Load the user's membership in a household (or in their default household).
+
+    Cached memberships are returned without leaving the event loop.
+
     Raises:
         HTTPException 403: If user is not a member of the household
         HTTPException 404: If user has no households
     """
-    repo = HogarRepository(db)
-    
+    membership = HogarRepository.get_cached_membership(user_id, hogar_id)
+    if membership is not None:
+        return membership
+
+    repo = db.service(HogarRepository)
+
     # If no hogar_id provided, use the first household the user belongs to
-    if x_hogar_id is None:
-        hogares = repo.get_hogares_by_user(user_id)
-        if not hogares:
+    if hogar_id is None:
+        membership = await repo.get_default_membership(user_id)
+        if not membership:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail="No tienes ningún hogar. Crea uno primero."
             )
-        x_hogar_id = hogares[0].id_hogar
-    
-    # DEBUG LOGGING
-    print(f"DEBUG: Checking access for user {user_id} to hogar {x_hogar_id}")
-    is_member = repo.user_is_member_of_hogar(user_id, x_hogar_id)
-    print(f"DEBUG: is_member result: {is_member}")
+        return membership
+
+    membership = await repo.get_membership(user_id, hogar_id)
 
     # Check if user is a member of this household
-    if not is_member:
-        print(f"DEBUG: Access DENIED for user {user_id} to hogar {x_hogar_id}")
+    if not membership:
+        logger.info("Access denied for user %s to hogar %s", user_id, hogar_id)
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
-            detail=f"No tienes acceso al hogar con ID {x_hogar_id}"
+            detail=f"No tienes acceso al hogar con ID {hogar_id}"
+        )
+
+    return membership
+
+
+async def resolve_hogar_token(
+    token: str,
+    hogar_id: int | None,
+    db: DBSession
+) -> MembershipInfo:
+    """
+    Validate a household session token and return the membership it grants.
+
+    Signature and expiry are checked locally. The token's membership row and
+    version are compared with the (cached) membership, so a role change or
+    removal revokes it.
+
+    Raises:
+        HTTPException 401: If the token is invalid, expired or revoked
+        HTTPException 403: If X-Hogar-Id names a different household
+    """
+    try:
+        claims = decode_hogar_token(token)
+    except InvalidHogarToken as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=f"Token de hogar inválido: {e}"
         )
-    
-    return x_hogar_id
+
+    if hogar_id is not None and hogar_id != claims.hogar_id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"El token de hogar no corresponde al hogar con ID {hogar_id}"
+        )
+
+    membership = HogarRepository.get_cached_membership(claims.user_id, claims.hogar_id)
+    if membership is None:
+        membership = await db.service(HogarRepository).get_membership(claims.user_id, claims.hogar_id)
+
+    if (
+        membership is None
+        or membership.id_miembro != claims.id_miembro
+        or membership.token_version != claims.version
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Token de hogar revocado. Solicita uno nuevo."
+        )
+
+    return membership
+
+
+async def get_active_membership(
+    x_hogar_id: int | None = Header(None, alias="X-Hogar-Id", description="Active household ID (optional - uses first household if not provided)"),
+    x_hogar_token: str | None = Header(None, alias="X-Hogar-Token", description="Household session token (optional - replaces the Firebase token)"),
+    user_id: str | None = Depends(get_firebase_user_id),
+    db: DBSession = Depends(get_session)
+) -> MembershipInfo:
+    """
+    Resolve the user's membership in the active household.
+
+    This dependency:
+    1. Reads the X-Hogar-Id header from the request (optional)
+    2. If an X-Hogar-Token is sent, validates it locally (no Firebase call)
+    3. Otherwise verifies the Firebase token and uses the user's first
+       household when no X-Hogar-Id is given
+    4. Loads the membership row once (TTL-cached across requests)
+
+    FastAPI caches dependency results per request, so get_active_hogar_id and
+    the role dependencies all share this single lookup.
+
+    Args:
+        x_hogar_id: Household ID from request header (optional)
+        x_hogar_token: Household session token from request header (optional)
+        user_id: Authenticated user ID (None when using X-Hogar-Token)
+        db: Database session (queries run off the event loop)
+
+    Returns:
+        The membership (household, user and role)
+
+    Raises:
+        HTTPException 401: If the household token is invalid or revoked
+        HTTPException 403: If user is not a member of the household
+        HTTPException 404: If user has no households
+    """
+    if x_hogar_token:
+        return await resolve_hogar_token(x_hogar_token, x_hogar_id, db)
+    return await resolve_membership(user_id, x_hogar_id, db)
+
+
+async def get_active_hogar_id(
+    membership: MembershipInfo = Depends(get_active_membership)
+) -> int:
+    """
+    Verify that the user has access to the requested household.
+
+    Args:
+        membership: Membership resolved by get_active_membership
+
+    Returns:
+        The household ID if user has access
+
+    Raises:
+        HTTPException 403: If user is not a member of the household
+        HTTPException 404: If user has no households
+    """
+    return membership.hogar_id
 
 
 async def require_admin_role(
-    hogar_id: int = Depends(get_active_hogar_id),
-    user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    membership: MembershipInfo = Depends(get_active_membership)
 ) -> Tuple[int, str]:
     """
     Verify that the user is an admin of the household.
-    
-    This dependency builds on get_active_hogar_id to additionally
+
+    This dependency builds on get_active_membership to additionally
     verify that the user has admin privileges.
-    
+
     Use this for sensitive operations like:
     - Deleting the household
     - Removing members
     - Changing member roles
     - Regenerating invitation codes
-    
+
     Args:
-        hogar_id: Household ID (already verified by get_active_hogar_id)
-        user_id: Authenticated user ID
-        db: Database session
-    
+        membership: Membership resolved by get_active_membership
+
     Returns:
         Tuple of (hogar_id, user_id)
-    
+
     Raises:
         HTTPException 403: If user is not an admin of the household
     """
-    repo = HogarRepository(db)
-    
     # Check if user is admin
-    if not repo.user_is_admin_of_hogar(user_id, hogar_id):
+    if membership.rol != 'admin':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Solo los administradores pueden realizar esta acción"
         )
-    
-    return hogar_id, user_id
+
+    return membership.hogar_id, membership.user_id
 
 
 async def require_miembro_or_admin_role(
-    hogar_id: int = Depends(get_active_hogar_id),
-    user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    membership: MembershipInfo = Depends(get_active_membership)
 ) -> Tuple[int, str]:
     """
     Verify that the user is at least a 'miembro' (not just 'invitado').
-    
+
     Use this for operations that require write access:
     - Adding products to inventory
     - Creating locations
     - Modifying stock
-    
+
     'invitado' role typically has read-only access.
-    
+
     Args:
-        hogar_id: Household ID (already verified by get_active_hogar_id)
-        user_id: Authenticated user ID
-        db: Database session
-    
+        membership: Membership resolved by get_active_membership
+
     Returns:
         Tuple of (hogar_id, user_id)
-    
+
     Raises:
         HTTPException 403: If user is only an 'invitado'
     """
-    repo = HogarRepository(db)
-    miembro = repo.get_miembro(user_id, hogar_id)
-    
-    # This should not happen as get_active_hogar_id already checked membership
-    if not miembro:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="No eres miembro de este hogar"
-        )
-    
     # Check role is not 'invitado'
-    if miembro.rol == 'invitado':
+    if membership.rol == 'invitado':
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Los invitados solo tienen acceso de lectura"
         )
-    
-    return hogar_id, user_id
+
+    return membership.hogar_id, membership.user_id
@@ -0,0 +1,93 @@
+# backend/fast_json.py
+"""
+Fast path for large list responses (stock, alerts, locations, shopping list).
+
+List endpoints select only the columns they return as plain row tuples (no ORM
+objects, identity map or relationship loading), build the response dicts
+directly and encode them once with orjson. Returning a Response skips FastAPI's
+response_model validation, so each builder below must produce exactly the shape
+of the schema named in its docstring; the endpoint keeps `response_model` for
+the OpenAPI docs.
+"""
+import orjson
+from fastapi import Response
+
+# Pydantic serializes UTC datetimes with 'Z'; naive datetimes are written as-is by both
+_ORJSON_OPTIONS = orjson.OPT_UTC_Z
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, option=_ORJSON_OPTIONS)
+
+
+def json_response(content, response: Response | None = None, status_code: int = 200) -> Response:
+    """
+    Encode `content` with orjson. Headers already set on the endpoint's injected
+    `response` (ETag, X-Hogar-Version...) are copied, as FastAPI does not merge them
+    into a returned Response.
+    """
+    return raw_json_response(dumps(content), response, status_code)
+
+
+def raw_json_response(body: bytes, response: Response | None = None, status_code: int = 200) -> Response:
+    """Like json_response, for a body that is already encoded (e.g. from a cache)."""
+    headers = None
+    if response is not None:
+        headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def product_dict(row) -> dict:
+    """schemas.item.ProductSchema from a row with the Product columns."""
+    return {
+        "id_producto": row.id_producto,
+        "nombre": row.nombre,
+        "marca": row.marca,
+        "barcode": row.barcode,
+        "image_url": row.image_url,
+        "dias_consumo_abierto": row.dias_consumo_abierto,
+    }
+
+
+def stock_item_dict(row) -> dict:
+    """schemas.item.StockItem from a StockRepository.STOCK_ROW_COLUMNS row."""
+    return {
+        "id_stock": row.id_stock,
+        "cantidad_actual": row.cantidad_actual,
+        "fecha_caducidad": row.fecha_caducidad,
+        "estado_producto": row.estado_producto,
+        "fecha_apertura": row.fecha_apertura,
+        "fecha_congelacion": row.fecha_congelacion,
+        "fecha_descongelacion": row.fecha_descongelacion,
+        "dias_caducidad_abierto": row.dias_caducidad_abierto,
+        "producto_maestro": product_dict(row),
+        "ubicacion": {"nombre": row.ubicacion_nombre, "id_ubicacion": row.id_ubicacion},
+    }
+
+
+def stock_alert_dict(row) -> dict:
+    """schemas.item.StockAlertItem from a StockRepository.STOCK_ROW_COLUMNS row."""
+    item = stock_item_dict(row)
+    del item["dias_caducidad_abierto"]
+    return item
+
+
+def location_dict(row) -> dict:
+    """schemas.location.Location from a LocationRepository.LOCATION_ROW_COLUMNS row."""
+    return {"nombre": row.nombre, "es_congelador": row.es_congelador, "id_ubicacion": row.id_ubicacion}
+
+
+def shopping_item_dict(row) -> dict:
+    """schemas.shopping_list.ShoppingItemResponse from a SHOPPING_ROW_COLUMNS row (product outer-joined)."""
+    return {
+        "producto_nombre": row.producto_nombre,
+        "cantidad": row.cantidad,
+        "fk_producto": row.fk_producto,
+        "id": row.id,
+        "hogar_id": row.hogar_id,
+        "completado": row.completado,
+        "added_by": row.added_by,
+        "created_at": row.created_at,
+        "updated_at": row.updated_at,
+        "producto": product_dict(row) if row.id_producto is not None else None,
+    }
@@ -0,0 +1,51 @@
+# backend/http_cache.py
+"""
+Conditional GET support (ETag / If-None-Match) for household read endpoints.
+
+The ETag combines the household's change version (see change_tracking.py)
+with everything else the response depends on: the endpoint, its query
+parameters and, for date-relative views, today's date. A matching
+If-None-Match is answered with 304 before running the endpoint's query.
+"""
+import hashlib
+from datetime import date
+
+from fastapi import Request, Response
+
+from database import DBSession
+from repositories.hogar_repository import HogarRepository
+
+CACHE_CONTROL = "private, no-cache"  # clients may store it but must revalidate
+VERSION_HEADER = "X-Hogar-Version"
+
+
+def make_etag(hogar_id: int, version: int, *parts) -> str:
+    digest = hashlib.sha1(repr(parts).encode("utf-8")).hexdigest()[:16]
+    return f'W/"h{hogar_id}-v{version}-{digest}"'
+
+
+def is_not_modified(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = {tag.strip() for tag in header.split(",")}
+    # Weak comparison: W/"x" and "x" match
+    return "*" in candidates or etag in candidates or etag.removeprefix("W/") in candidates
+
+
+async def conditional_response(request: Request, response: Response, db: DBSession, hogar_id: int, *parts) -> Response | None:
+    """
+    Set ETag/Cache-Control/X-Hogar-Version on `response`; return a 304 response if the client's copy is current.
+
+    The version is read before the data, so a concurrent write is never masked by
+    an old ETag, and X-Hogar-Version is a safe starting point for /inventory/sync.
+    It is also left in `request.state.hogar_version` for endpoints that cache by version.
+    """
+    version = await db.service(HogarRepository).get_version(hogar_id) or 0
+    request.state.hogar_version = version
+    etag = make_etag(hogar_id, version, date.today().isoformat(), *parts)
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL, VERSION_HEADER: str(version)}
+    if is_not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -0,0 +1,66 @@
+# backend/jobs.py
+"""Periodic jobs run by the in-process scheduler (see scheduler.py). Each one opens its own session."""
+
+import os
+from datetime import datetime, timedelta
+
+from database import SessionLocal
+from repositories.change_log_repository import ChangeLogRepository
+from services.notification_service import NotificationService, drain_notification_outbox
+
+HOUR = 3600
+DAY = 24 * HOUR
+# Reintentos del outbox: cada cuánto se vacía la cola
+OUTBOX_DRAIN_SECONDS = float(os.getenv("OUTBOX_DRAIN_SECONDS", "120"))
+# Antigüedad máxima del registro de cambios (sync incremental)
+HOGAR_CAMBIOS_RETENTION_DAYS = int(os.getenv("HOGAR_CAMBIOS_RETENTION_DAYS", "30"))
+
+
+def notifications_job() -> dict:
+    """Hourly: enqueue the notifications due this hour, then deliver them."""
+    db = SessionLocal()
+    try:
+        service = NotificationService(db)
+        result = service.trigger_daily_notifications()
+        if result["enqueued"]:
+            result["delivery"] = service.drain_outbox()
+        return result
+    finally:
+        db.close()
+
+
+def prune_devices_job() -> dict:
+    db = SessionLocal()
+    try:
+        return {"devices_deleted": NotificationService(db).prune_stale_devices()}
+    finally:
+        db.close()
+
+
+def prune_outbox_job() -> dict:
+    db = SessionLocal()
+    try:
+        return {"rows_deleted": NotificationService(db).prune_outbox()}
+    finally:
+        db.close()
+
+
+def prune_change_log_job() -> dict:
+    db = SessionLocal()
+    try:
+        before = datetime.utcnow() - timedelta(days=HOGAR_CAMBIOS_RETENTION_DAYS)
+        deleted = ChangeLogRepository(db).prune(before)
+        db.commit()
+        return {"rows_deleted": deleted}
+    finally:
+        db.close()
+
+
+def register_jobs(scheduler):
+    # Al arrancar también: si el worker estaba dormido a en punto, la hora actual no se pierde
+    # (la cola es idempotente por usuario y día)
+    scheduler.add_job("notifications", notifications_job, HOUR, run_on_start=True)
+    scheduler.add_job("notification_outbox_drain", drain_notification_outbox, OUTBOX_DRAIN_SECONDS)
+    scheduler.add_job("prune_devices", prune_devices_job, DAY)
+    scheduler.add_job("prune_notification_outbox", prune_outbox_job, DAY)
+    scheduler.add_job("prune_hogar_cambios", prune_change_log_job, DAY)
@@ -1,9 +1,17 @@
 # backend/main.py
+import asyncio
+from contextlib import asynccontextmanager
+from anyio import to_thread
 from fastapi import FastAPI, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 
+from auth.firebase_auth import certificate_refresher
+from cache import cache_stats
+from realtime import change_broker, change_listener
+from scheduler import scheduler
+
 # Importaciones de SQLAlchemy
-from database import engine, Base
+from database import engine, Base, get_pool_stats
 import models  # Asegura que los modelos se registren
 
 # Creación de las tablas en la base de datos (si no existen)
@@ -13,8 +21,26 @@ Base.metadata.create_all(bind=engine)
 from routers import router as inventory_router
 from routers import notifications as notifications_router
 from routers import shopping_list as shopping_list_router
+from jobs import register_jobs
+
+register_jobs(scheduler)
+
 
-app = FastAPI(title="Core Inventory API (Modular)")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tareas en segundo plano del worker (arranque / parada)
+    certificate_refresher.start()
+    change_broker.start(asyncio.get_running_loop())
+    change_listener.start()
+    scheduler.start()
+    yield
+    scheduler.stop()
+    change_listener.stop()
+    change_broker.stop()
+    certificate_refresher.stop()
+
+
+app = FastAPI(title="Core Inventory API (Modular)", lifespan=lifespan)
 
 # Configuración de CORS
 # En desarrollo, Flutter web puede usar cualquier puerto. Usamos una expresión regular
@@ -58,4 +84,49 @@ def health_check():
     para mantener el servicio activo.
     Devuelve una respuesta vacía con código 200 OK.
     """
-    return Response(status_code=status.HTTP_200_OK)
\ No newline at end of file
+    return Response(status_code=status.HTTP_200_OK)
+
+@app.get(
+    "/health/db-pool",
+    summary="Database Pool Stats",
+    description="Estado del pool de conexiones y límite del threadpool del worker.",
+    tags=["Health"]
+)
+async def db_pool_stats():
+    """
+    Expone el uso del pool (conexiones en uso, overflow, tiempos de espera)
+    junto al tamaño del threadpool, para dimensionar DB_POOL_SIZE/DB_MAX_OVERFLOW.
+    """
+    stats = get_pool_stats()
+    stats["threadpool_limit"] = to_thread.current_default_thread_limiter().total_tokens
+    return stats
+
+
+@app.get(
+    "/health/caches",
+    summary="In-process Cache Stats",
+    description="Tamaño y tasa de aciertos de las cachés en memoria de este worker.",
+    tags=["Health"]
+)
+def caches_stats():
+    return cache_stats()
+
+
+@app.get(
+    "/health/realtime",
+    summary="Realtime Stream Stats",
+    description="Suscriptores SSE conectados a este worker y estado de su conexión LISTEN.",
+    tags=["Health"]
+)
+def realtime_stats():
+    return change_broker.stats()
+
+
+@app.get(
+    "/health/scheduler",
+    summary="Scheduled Jobs",
+    description="Jobs periódicos de este worker: si le pertenecen, duración y resultado de la última ejecución.",
+    tags=["Health"]
+)
+def scheduler_stats():
+    return scheduler.stats()
@@ -1,5 +1,5 @@
 # backend/models.py
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, UniqueConstraint, Index, Boolean, DateTime
+from sqlalchemy import Column, Integer, BigInteger, String, Date, ForeignKey, UniqueConstraint, Index, Boolean, DateTime
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from database import Base
@@ -18,6 +18,7 @@ class Hogar(Base):
     fecha_creacion = Column(DateTime, default=datetime.utcnow, nullable=False)
     icono = Column(String(50), default='home', nullable=False)  # Icon identifier
     codigo_invitacion = Column(String(8), unique=True, nullable=False, index=True)  # Invitation code
+    version = Column(Integer, default=0, server_default='0', nullable=False)  # Bumped on every data change (ETags)
     
     # Relationships
     miembros = relationship("HogarMiembro", back_populates="hogar", cascade="all, delete-orphan")
@@ -45,6 +46,7 @@ class HogarMiembro(Base):
     rol = Column(String(50), default='miembro', nullable=False, index=True)  # admin, miembro, invitado
     fecha_union = Column(DateTime, default=datetime.utcnow, nullable=False)
     apodo = Column(String(100), nullable=True)  # Friendly nickname within household
+    token_version = Column(Integer, default=0, server_default='0', nullable=False)  # Bumped to revoke household tokens
     
     __table_args__ = (
         UniqueConstraint('fk_hogar', 'user_id', name='hogar_miembro_unique'),
@@ -99,6 +101,7 @@ class Product(Base):
     __table_args__ = (
         UniqueConstraint('barcode', 'hogar_id', name='producto_barcode_hogar_unique'),
         Index('ix_producto_hogar_nombre', 'hogar_id', 'nombre'),
+        # Postgres also has pg_trgm GIN indexes on nombre/marca/barcode (migration only)
     )
 
     # Relationships
@@ -116,7 +119,7 @@ class Product(Base):
 class InventoryStock(Base):
     """Units of a product in a specific location within a household.
 
-    Grouped by (product, location, expiration_date).
+    Grouped by (product, location, expiration_date, state); the grouping key is unique.
     Now supports product states: closed (sealed), open, frozen.
     """
     __tablename__ = 'inventario_stock'
@@ -136,8 +139,19 @@ class InventoryStock(Base):
     dias_caducidad_abierto = Column(Integer, nullable=True)  # Shelf life days once opened
     
     __table_args__ = (
+        # Grouping key: adding stock upserts into the row with the same key
+        UniqueConstraint(
+            'hogar_id', 'fk_producto_maestro', 'fk_ubicacion', 'fecha_caducidad', 'estado_producto',
+            name='stock_grouping_unique'
+        ),
         Index('ix_stock_hogar_fecha', 'hogar_id', 'fecha_caducidad'),
         Index('ix_inventario_stock_estado', 'estado_producto'),
+        # Expiry alerts: non-frozen items of a household in expiry order
+        Index(
+            'ix_stock_alertas', 'hogar_id', 'fecha_caducidad',
+            postgresql_where=(estado_producto != 'congelado'),
+            sqlite_where=(estado_producto != 'congelado'),
+        ),
     )
 
     # Relationships
@@ -176,6 +190,17 @@ class UserPreference(Base):
     notifications_enabled = Column(Boolean, default=True)
     notification_time = Column(String(8), default='09:00:00')  # Stored as string HH:MM:SS for simplicity
     timezone_offset = Column(Integer, default=0)  # Offset in minutes
+    # notification_time converted to UTC minutes since midnight (default: 09:00 with offset 0).
+    # Kept in sync by NotificationService.update_preferences; the hourly cron filters on it.
+    notification_utc_minute = Column(Integer, default=540, server_default='540', nullable=False)
+
+    __table_args__ = (
+        Index(
+            'ix_user_preferences_utc_minute', 'notification_utc_minute',
+            postgresql_where=(notifications_enabled == True),  # noqa: E712
+            sqlite_where=(notifications_enabled == True),  # noqa: E712
+        ),
+    )
 
     def __repr__(self) -> str:  # pragma: no cover
         return f"UserPreference(user={self.user_id}, enabled={self.notifications_enabled})"
@@ -201,3 +226,63 @@ class ShoppingListItem(Base):
 
     def __repr__(self) -> str:  # pragma: no cover
         return f"ShoppingItem(id={self.id}, nombre={self.producto_nombre}, hogar={self.hogar_id})"
+
+
+class HogarCambio(Base):
+    """Append-only change log of a household, read by the delta sync endpoint.
+
+    One row per changed entity and committed transaction; `version` is the
+    household version that transaction produced (Hogar.version).
+    """
+    __tablename__ = 'hogar_cambios'
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)  # SQLite only autoincrements INTEGER
+    hogar_id = Column(Integer, ForeignKey('hogares.id_hogar', ondelete='CASCADE'), nullable=False)
+    version = Column(Integer, nullable=False)
+    entidad = Column(String(20), nullable=False)  # stock, ubicacion, producto, lista_compra
+    entidad_id = Column(Integer, nullable=False)
+    operacion = Column(String(10), nullable=False)  # upsert, delete
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (
+        Index('ix_hogar_cambios_hogar_version', 'hogar_id', 'version'),
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"HogarCambio(hogar={self.hogar_id}, v={self.version}, {self.operacion} {self.entidad}#{self.entidad_id})"
+
+
+class NotificationOutbox(Base):
+    """Push notification waiting to be delivered (or already delivered) to a user's devices.
+
+    The cron enqueues at most one row per user and day (unique `user_id`, `fecha`),
+    so re-running it does not send duplicates; workers drain pending rows with
+    FOR UPDATE SKIP LOCKED and retry transient failures with backoff.
+    """
+    __tablename__ = 'notification_outbox'
+
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)  # SQLite only autoincrements INTEGER
+    user_id = Column(String(255), nullable=False)
+    fecha = Column(Date, nullable=False)  # UTC day the notification belongs to
+    tipo = Column(String(30), nullable=False, default='expiry_alert')
+    title = Column(String(200), nullable=False)
+    body = Column(String, nullable=False)
+    status = Column(String(10), nullable=False, default='pending')  # pending, sent, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = Column(String(200), nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint('user_id', 'fecha', name='notification_outbox_user_fecha_unique'),
+        # Rows the drain picks up next
+        Index(
+            'ix_notification_outbox_pending', 'next_attempt_at',
+            postgresql_where=(status == 'pending'),
+            sqlite_where=(status == 'pending'),
+        ),
+    )
+
+    def __repr__(self) -> str:  # pragma: no cover
+        return f"NotificationOutbox(user={self.user_id}, fecha={self.fecha}, status={self.status})"
@@ -0,0 +1,136 @@
+# backend/push.py
+"""
+Batched push delivery through Firebase Cloud Messaging.
+
+Callers queue one `messaging.Message` per device token and call `send_messages`
+once. Messages go out in chunks of up to FCM_BATCH_SIZE (the `send_each` limit)
+from a bounded pool of FCM_MAX_WORKERS threads, and every token gets a
+`DeliveryResult` back, in input order.
+
+FCM_TRANSPORT=fake swaps FCM for an in-process transport (no network, no
+credentials) so the notification cron can be load-tested offline; see
+benchmarks/notification_cron.py.
+"""
+
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import NamedTuple
+
+from firebase_admin import exceptions, messaging
+
+logger = logging.getLogger(__name__)
+
+# send_each admite como máximo 500 mensajes por llamada
+FCM_BATCH_SIZE = 500
+FCM_MAX_WORKERS = int(os.getenv("FCM_MAX_WORKERS", "4"))
+FCM_TRANSPORT = os.getenv("FCM_TRANSPORT", "firebase").strip().lower()
+# Transporte fake: latencia simulada por lote
+FCM_FAKE_LATENCY_MS = float(os.getenv("FCM_FAKE_LATENCY_MS", "50"))
+
+# Errores que indican que el token ya no sirve: el dispositivo se borra de user_devices
+DEAD_TOKEN_ERRORS = frozenset({"UNREGISTERED", "INVALID_ARGUMENT"})
+
+# Error codes FCM reports for a specific token (see firebase_admin.messaging)
+_ERROR_CODES = {
+    messaging.UnregisteredError: "UNREGISTERED",
+    messaging.SenderIdMismatchError: "SENDER_ID_MISMATCH",
+    messaging.QuotaExceededError: "QUOTA_EXCEEDED",
+    messaging.ThirdPartyAuthError: "THIRD_PARTY_AUTH_ERROR",
+}
+
+
+class DeliveryResult(NamedTuple):
+    token: str
+    ok: bool
+    message_id: str | None = None
+    error: str | None = None  # FCM error code, e.g. UNREGISTERED or INVALID_ARGUMENT
+
+    @property
+    def dead_token(self) -> bool:
+        """FCM rejected the token itself: the device should be forgotten."""
+        return self.error in DEAD_TOKEN_ERRORS
+
+
+def error_code(exc: Exception) -> str:
+    for cls, code in _ERROR_CODES.items():
+        if isinstance(exc, cls):
+            return code
+    if isinstance(exc, exceptions.FirebaseError):
+        return exc.code
+    return type(exc).__name__
+
+
+class FirebaseTransport:
+    """Sends a batch with messaging.send_each (one HTTP/2 request per message, sent concurrently)."""
+
+    def send_batch(self, messages: list[messaging.Message]) -> list[DeliveryResult]:
+        response = messaging.send_each(messages)
+        return [
+            DeliveryResult(message.token, r.success, r.message_id, None if r.success else error_code(r.exception))
+            for message, r in zip(messages, response.responses)
+        ]
+
+
+class FakeTransport:
+    """
+    Offline stand-in for FCM. Each batch takes FCM_FAKE_LATENCY_MS; tokens starting
+    with 'unregistered' or 'invalid' fail with UNREGISTERED / INVALID_ARGUMENT.
+    """
+
+    def __init__(self, latency_ms: float = FCM_FAKE_LATENCY_MS):
+        self.latency = latency_ms / 1000
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.sent = 0
+
+    def send_batch(self, messages: list[messaging.Message]) -> list[DeliveryResult]:
+        time.sleep(self.latency)
+        with self._lock:
+            self.batches += 1
+            self.sent += len(messages)
+        results = []
+        for i, message in enumerate(messages):
+            if message.token.startswith("unregistered"):
+                results.append(DeliveryResult(message.token, False, error="UNREGISTERED"))
+            elif message.token.startswith("invalid"):
+                results.append(DeliveryResult(message.token, False, error="INVALID_ARGUMENT"))
+            else:
+                results.append(DeliveryResult(message.token, True, message_id=f"fake/{self.sent}/{i}"))
+        return results
+
+
+def get_transport():
+    if FCM_TRANSPORT == "fake":
+        return FakeTransport()
+    if FCM_TRANSPORT != "firebase":
+        raise ValueError(f"FCM_TRANSPORT inválido: {FCM_TRANSPORT!r} (usa 'firebase' o 'fake')")
+    return FirebaseTransport()
+
+
+def send_messages(
+    messages: list[messaging.Message],
+    transport=None,
+    batch_size: int | None = None,
+    max_workers: int | None = None,
+) -> list[DeliveryResult]:
+    """Send all messages in batches from a bounded thread pool. Returns one result per message, in order."""
+    if not messages:
+        return []
+    transport = transport or get_transport()
+    batch_size = min(batch_size or FCM_BATCH_SIZE, FCM_BATCH_SIZE)
+    max_workers = max_workers or FCM_MAX_WORKERS
+    batches = [messages[i:i + batch_size] for i in range(0, len(messages), batch_size)]
+
+    def send(batch):
+        try:
+            return transport.send_batch(batch)
+        except Exception as e:
+            # Fallo del lote entero (red, credenciales): se marca cada token, sin darlo por muerto
+            logger.error(f"Error sending FCM batch of {len(batch)}: {e}")
+            return [DeliveryResult(message.token, False, error=f"BATCH_{type(e).__name__}") for message in batch]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(batches))) as pool:
+        return [result for batch_results in pool.map(send, batches) for result in batch_results]
@@ -3,9 +3,13 @@
 from .location_repository import LocationRepository
 from .product_repository import ProductRepository
 from .stock_repository import StockRepository
+from .change_log_repository import ChangeLogRepository
+from .notification_outbox_repository import NotificationOutboxRepository
 
 __all__ = [
     "LocationRepository",
     "ProductRepository",
     "StockRepository",
+    "ChangeLogRepository",
+    "NotificationOutboxRepository",
 ]
@@ -0,0 +1,38 @@
+# backend/repositories/change_log_repository.py
+from datetime import datetime
+from sqlalchemy import delete, func
+from sqlalchemy.orm import Session
+from models import HogarCambio
+
+
+class ChangeLogRepository:
+    """Read access to the household change log (rows are written by change_tracking)."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_changes(self, hogar_id: int, since: int, until: int, limit: int) -> list[HogarCambio]:
+        """Log rows with since < version <= until, oldest first (at most `limit`)."""
+        return (
+            self.db.query(HogarCambio)
+            .filter(
+                HogarCambio.hogar_id == hogar_id,
+                HogarCambio.version > since,
+                HogarCambio.version <= until
+            )
+            .order_by(HogarCambio.version, HogarCambio.id)
+            .limit(limit)
+            .all()
+        )
+
+    def get_oldest_version(self, hogar_id: int) -> int | None:
+        """Oldest version still in the log (older entries may have been pruned)."""
+        return (
+            self.db.query(func.min(HogarCambio.version))
+            .filter(HogarCambio.hogar_id == hogar_id)
+            .scalar()
+        )
+
+    def prune(self, before: datetime) -> int:
+        """Delete log rows written before `before`; clients older than the log get `reset`. Does not commit."""
+        return self.db.execute(delete(HogarCambio).where(HogarCambio.created_at < before)).rowcount
@@ -1,11 +1,44 @@
 # backend/repositories/hogar_repository.py
 from sqlalchemy.orm import Session
+from dataclasses import dataclass
 from typing import Optional
+from cache import TTLCache
 from models import Hogar, HogarMiembro
+import os
 import secrets
 import string
 
 
+@dataclass(frozen=True)
+class MembershipInfo:
+    """Detached snapshot of a HogarMiembro row, safe to cache and share across requests."""
+    hogar_id: int
+    user_id: str
+    rol: str
+    id_miembro: int = 0
+    token_version: int = 0
+
+    @classmethod
+    def from_miembro(cls, miembro: HogarMiembro) -> "MembershipInfo":
+        return cls(
+            hogar_id=miembro.fk_hogar,
+            user_id=miembro.user_id,
+            rol=miembro.rol,
+            id_miembro=miembro.id_miembro,
+            token_version=miembro.token_version or 0,
+        )
+
+
+# Cross-request membership cache keyed by (user_id, hogar_id); (user_id, None) holds the
+# user's default household. Invalidated locally by the membership write methods below;
+# other workers see changes once the TTL expires.
+membership_cache = TTLCache(
+    maxsize=int(os.getenv("MEMBERSHIP_CACHE_SIZE", "10000")),
+    ttl=float(os.getenv("MEMBERSHIP_CACHE_TTL", "60")),
+    name="membership",
+)
+
+
 class HogarRepository:
     """Repository for household and membership data access."""
     
@@ -82,8 +115,13 @@ class HogarRepository:
         
         self.db.delete(hogar)
         self.db.commit()
+        membership_cache.invalidate(lambda key, info: info.hogar_id == hogar_id)
         return True
     
+    def get_version(self, hogar_id: int) -> Optional[int]:
+        """Current change version of the household (primary-key lookup, used for ETags)."""
+        return self.db.query(Hogar.version).filter(Hogar.id_hogar == hogar_id).scalar()
+    
     def regenerate_invitation_code(self, hogar_id: int) -> Optional[str]:
         """Generate a new invitation code for the household."""
         hogar = self.get_hogar_by_id(hogar_id)
@@ -118,6 +156,8 @@ class HogarRepository:
         self.db.add(miembro)
         self.db.commit()
         self.db.refresh(miembro)
+        # A new membership can change the user's default household
+        membership_cache.invalidate(lambda key, info: key[0] == user_id)
         return miembro
     
     def get_miembro(self, user_id: str, hogar_id: int) -> Optional[HogarMiembro]:
@@ -148,8 +188,11 @@ class HogarRepository:
             return None
         
         miembro.rol = nuevo_rol
+        # Revoke household tokens issued with the previous role
+        miembro.token_version = (miembro.token_version or 0) + 1
         self.db.commit()
         self.db.refresh(miembro)
+        self._invalidate_membership(user_id, hogar_id)
         return miembro
     
     def update_miembro_apodo(
@@ -176,8 +219,45 @@ class HogarRepository:
         
         self.db.delete(miembro)
         self.db.commit()
+        self._invalidate_membership(user_id, hogar_id)
         return True
     
+    @staticmethod
+    def get_cached_membership(user_id: str, hogar_id: Optional[int]) -> Optional[MembershipInfo]:
+        """Return the cached membership without touching the database (None on a miss)."""
+        return membership_cache.get((user_id, hogar_id))
+    
+    def get_membership(self, user_id: str, hogar_id: int) -> Optional[MembershipInfo]:
+        """Get membership for a user in a household, served from the TTL cache when possible."""
+        key = (user_id, hogar_id)
+        info = membership_cache.get(key)
+        if info is None:
+            miembro = self.get_miembro(user_id, hogar_id)
+            if not miembro:
+                return None  # Not cached: a later join must be visible immediately
+            info = MembershipInfo.from_miembro(miembro)
+            membership_cache.set(key, info)
+        return info
+    
+    def get_default_membership(self, user_id: str) -> Optional[MembershipInfo]:
+        """Get membership in the user's most recently created household (single query)."""
+        key = (user_id, None)
+        info = membership_cache.get(key)
+        if info is None:
+            miembro = (
+                self.db.query(HogarMiembro)
+                .join(Hogar)
+                .filter(HogarMiembro.user_id == user_id)
+                .order_by(Hogar.fecha_creacion.desc())
+                .first()
+            )
+            if not miembro:
+                return None
+            info = MembershipInfo.from_miembro(miembro)
+            membership_cache.set(key, info)
+            membership_cache.set((user_id, info.hogar_id), info)
+        return info
+    
     def user_is_member_of_hogar(self, user_id: str, hogar_id: int) -> bool:
         """Check if user is a member of the household."""
         return self.get_miembro(user_id, hogar_id) is not None
@@ -196,6 +276,12 @@ class HogarRepository:
     
     # ========== HELPER METHODS ==========
     
+    def _invalidate_membership(self, user_id: str, hogar_id: int):
+        """Drop cached entries (including the default-household entry) for this membership."""
+        membership_cache.invalidate(
+            lambda key, info: key[0] == user_id and info.hogar_id == hogar_id
+        )
+    
     def _generate_invitation_code(self) -> str:
         """Generate a unique 8-character invitation code."""
         while True:
@@ -1,7 +1,11 @@
 # backend/repositories/location_repository.py
+from sqlalchemy import Row
 from sqlalchemy.orm import Session
 from models import Location, InventoryStock
 
+# Columns of the location list (fast_json.location_dict)
+LOCATION_ROW_COLUMNS = (Location.id_ubicacion, Location.nombre, Location.es_congelador)
+
 
 class LocationRepository:
     def __init__(self, db: Session):
@@ -15,6 +19,14 @@ class LocationRepository:
             .first()
         )
 
+    def get_locations_by_ids_and_hogar(self, ids: set[int], hogar_id: int) -> list[Location]:
+        """Get several locations by ID within a specific household."""
+        return (
+            self.db.query(Location)
+            .filter(Location.id_ubicacion.in_(ids), Location.hogar_id == hogar_id)
+            .all()
+        )
+
     def get_location_by_name_and_hogar(self, nombre: str, hogar_id: int) -> Location | None:
         """Get location by name within a specific household."""
         return (
@@ -23,10 +35,10 @@ class LocationRepository:
             .first()
         )
 
-    def get_all_locations_for_hogar(self, hogar_id: int) -> list[Location]:
-        """Get all locations for a household."""
+    def get_all_locations_for_hogar(self, hogar_id: int) -> list[Row]:
+        """Get all locations for a household, as LOCATION_ROW_COLUMNS rows."""
         return (
-            self.db.query(Location)
+            self.db.query(*LOCATION_ROW_COLUMNS)
             .filter(Location.hogar_id == hogar_id)
             .order_by(Location.nombre)
             .all()
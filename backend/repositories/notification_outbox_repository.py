@@ -0,0 +1,69 @@
+# backend/repositories/notification_outbox_repository.py
+from datetime import datetime
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+from models import NotificationOutbox
+
+
+class NotificationOutboxRepository:
+    """Queue of push notifications (notification_outbox). Does not commit."""
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    def enqueue(self, rows: list[dict]) -> int:
+        """
+        Insert outbox rows, skipping users that already have one for that `fecha`
+        (ON CONFLICT DO NOTHING on the unique key). Returns how many were new.
+        """
+        insert = self._dialect_insert()
+        if insert is None:
+            return self._enqueue_missing(rows)
+        # executemany: SQLAlchemy lo agrupa en INSERTs de varias filas (insertmanyvalues)
+        stmt = insert(NotificationOutbox).on_conflict_do_nothing(index_elements=["user_id", "fecha"])
+        return len(self.db.execute(stmt.returning(NotificationOutbox.id), rows).all())
+
+    def claim_due(self, now: datetime, limit: int) -> list[NotificationOutbox]:
+        """
+        Lock up to `limit` pending rows due by `now`, oldest first. Rows locked by another
+        worker are skipped (FOR UPDATE SKIP LOCKED), so concurrent drains never share a row.
+        The locks last until the caller commits.
+        """
+        return list(self.db.scalars(
+            select(NotificationOutbox)
+            .where(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now)
+            .order_by(NotificationOutbox.next_attempt_at, NotificationOutbox.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        ))
+
+    def prune(self, before: datetime) -> int:
+        """Delete delivered or failed rows created before `before`."""
+        return self.db.execute(
+            delete(NotificationOutbox).where(
+                NotificationOutbox.status != 'pending',
+                NotificationOutbox.created_at < before,
+            )
+        ).rowcount
+
+    def _dialect_insert(self):
+        """Dialect-specific insert() supporting ON CONFLICT, or None."""
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        return insert
+
+    def _enqueue_missing(self, rows: list[dict]) -> int:
+        # Dialects without ON CONFLICT: lookup + insert (not race-free)
+        existing = set(self.db.execute(
+            select(NotificationOutbox.user_id, NotificationOutbox.fecha)
+            .where(NotificationOutbox.user_id.in_({row["user_id"] for row in rows}))
+        ).tuples())
+        missing = [row for row in rows if (row["user_id"], row["fecha"]) not in existing]
+        self.db.add_all(NotificationOutbox(**row) for row in missing)
+        self.db.flush()
+        return len(missing)
@@ -1,7 +1,8 @@
 # backend/repositories/product_repository.py
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import func, and_, or_, case
 from models import Product
+from repositories.text_search import LIKE_ESCAPE, contains_pattern, supports_trigram
 
 class ProductRepository:
     def __init__(self, db: Session):
@@ -11,6 +12,35 @@ class ProductRepository:
         """Get a product by its ID."""
         return self.db.query(Product).filter(Product.id_producto == product_id).first()
 
+    def get_by_ids_and_hogar(self, product_ids: set[int], hogar_id: int) -> list[Product]:
+        """Get several products by ID, restricted to a household."""
+        return (
+            self.db.query(Product)
+            .filter(Product.id_producto.in_(product_ids), Product.hogar_id == hogar_id)
+            .all()
+        )
+
+    def get_by_barcodes_and_hogar(self, barcodes: set[str], hogar_id: int) -> list[Product]:
+        """Get several products by barcode within a household."""
+        return (
+            self.db.query(Product)
+            .filter(Product.barcode.in_(barcodes), Product.hogar_id == hogar_id)
+            .all()
+        )
+
+    def get_by_names_without_barcode(self, names: set[str], hogar_id: int) -> list[Product]:
+        """Get household products without barcode whose lower-cased name is in `names`."""
+        return (
+            self.db.query(Product)
+            .filter(
+                func.lower(Product.nombre).in_(names),
+                Product.barcode.is_(None),
+                Product.hogar_id == hogar_id,
+            )
+            .order_by(Product.id_producto)
+            .all()
+        )
+
     def get_or_create_by_name(self, name: str, hogar_id: int, brand: str | None = None) -> Product:
         """Get or create a product by name within a household (for products without barcode)."""
         # Case-insensitive search for household products without a barcode
@@ -83,13 +113,29 @@ class ProductRepository:
         return product
 
     def search_by_name(self, query: str, hogar_id: int, limit: int = 10) -> list[Product]:
-        """Search products by name (case-insensitive) within a household."""
-        return (
-            self.db.query(Product)
-            .filter(
-                Product.hogar_id == hogar_id,
-                func.lower(Product.nombre).contains(func.lower(query))
+        """
+        Search products by name within a household, best matches first (autocomplete).
+
+        Postgres: substring (ILIKE) or trigram-similar names (typo tolerant), ranked
+        by similarity; both use the pg_trgm GIN index. Other backends: case-insensitive
+        substring match, prefix matches first.
+        """
+        pattern = contains_pattern(query)
+        base = self.db.query(Product).filter(Product.hogar_id == hogar_id)
+        if supports_trigram(self.db):
+            return (
+                base.filter(or_(
+                    Product.nombre.ilike(pattern, escape=LIKE_ESCAPE),
+                    Product.nombre.op("%")(query)
+                ))
+                .order_by(func.similarity(Product.nombre, query).desc(), Product.nombre)
+                .limit(limit)
+                .all()
             )
+        starts_with = func.lower(Product.nombre).like(pattern[1:].lower(), escape=LIKE_ESCAPE)
+        return (
+            base.filter(func.lower(Product.nombre).like(pattern.lower(), escape=LIKE_ESCAPE))
+            .order_by(case((starts_with, 0), else_=1), Product.nombre)
             .limit(limit)
             .all()
         )
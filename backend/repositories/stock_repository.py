@@ -1,97 +1,223 @@
 # backend/repositories/stock_repository.py
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, or_
+from sqlalchemy import Row, and_, case, delete, func, or_, select, tuple_, update
 from datetime import date, timedelta
 from models import InventoryStock, Product, Location
+from repositories.text_search import LIKE_ESCAPE, contains_pattern
+from change_tracking import record_change
+
+# Columns of the stock_grouping_unique constraint
+STOCK_GROUPING_KEY = ('hogar_id', 'fk_producto_maestro', 'fk_ubicacion', 'fecha_caducidad', 'estado_producto')
+
+# Sort modes of the stock listing: (columns, descending). id_stock is always the last key.
+_SORT_MODES = {
+    'expiry_asc': ([InventoryStock.fecha_caducidad], False),
+    'expiry_desc': ([InventoryStock.fecha_caducidad], True),
+    'name_asc': ([Product.nombre], False),
+    'name_desc': ([Product.nombre], True),
+    'quantity_asc': ([InventoryStock.cantidad_actual], False),
+    'quantity_desc': ([InventoryStock.cantidad_actual], True),
+}
+_DEFAULT_SORT = ([Product.nombre, InventoryStock.fecha_caducidad], False)
+
+# Expiry buckets of the status filter and the summary, in days from today (frozen items excluded):
+# caducado < 0 <= urgente <= URGENT_DAYS < por_caducar <= EXPIRING_DAYS
+URGENT_DAYS = 5
+EXPIRING_DAYS = 10
+
+# Alert priority within the same expiry date (lower first); any other state counts as 'cerrado'
+_ALERT_STATE_PRIORITY = {
+    'descongelado': 0,
+    'abierto': 1,
+    'cerrado': 2,
+}
+
+# Columns of the list endpoints (fast_json.stock_item_dict): plain rows, no ORM objects.
+# Sort columns keep their own key (e.g. `nombre`), so stock_sort_key can read them from a row.
+STOCK_ROW_COLUMNS = (
+    InventoryStock.id_stock,
+    InventoryStock.cantidad_actual,
+    InventoryStock.fecha_caducidad,
+    InventoryStock.estado_producto,
+    InventoryStock.fecha_apertura,
+    InventoryStock.fecha_congelacion,
+    InventoryStock.fecha_descongelacion,
+    InventoryStock.dias_caducidad_abierto,
+    Product.id_producto,
+    Product.nombre,
+    Product.marca,
+    Product.barcode,
+    Product.image_url,
+    Product.dias_consumo_abierto,
+    Location.id_ubicacion,
+    Location.nombre.label('ubicacion_nombre'),
+)
+
+# Optional columns, so every row of a multi-row upsert has the same keys
+_UPSERT_DEFAULTS = {
+    'fecha_apertura': None,
+    'fecha_congelacion': None,
+    'fecha_descongelacion': None,
+    'dias_caducidad_abierto': None,
+}
 
 class StockRepository:
     def __init__(self, db: Session):
         self.db = db
 
-    def create_stock_item(self, hogar_id: int, fk_producto_maestro: int, fk_ubicacion: int, cantidad_actual: int, fecha_caducidad: date, estado_producto: str = 'cerrado', fecha_congelacion: date | None = None) -> InventoryStock:
-        """Create a new stock item in a household."""
-        new_item = InventoryStock(
+    def upsert_stock_items(self, rows: list[dict]) -> list[InventoryStock]:
+        """
+        Add stock atomically: one INSERT ... ON CONFLICT (grouping key) DO UPDATE
+        SET cantidad_actual = cantidad_actual + excluded.cantidad_actual RETURNING.
+
+        Each dict holds the InventoryStock columns of one row; keys in STOCK_GROUPING_KEY
+        must be distinct across `rows`. On conflict only the quantity changes, the
+        existing row keeps its dates. Returns the resulting rows (not necessarily in
+        input order). Does not commit, so callers can combine it with other changes.
+        """
+        insert = self._dialect_insert()
+        if insert is None:
+            # Dialects without ON CONFLICT: lookup + increment (not race-free)
+            return [self._find_and_increment(row) for row in rows]
+
+        values = [{**_UPSERT_DEFAULTS, **row} for row in rows]
+        stmt = insert(InventoryStock).values(values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(STOCK_GROUPING_KEY),
+            set_={"cantidad_actual": InventoryStock.cantidad_actual + stmt.excluded.cantidad_actual},
+        ).returning(InventoryStock)
+        items = list(self.db.scalars(stmt, execution_options={"populate_existing": True}))
+        for item in items:
+            record_change(self.db, item.hogar_id, 'stock', item.id_stock)  # Core statement: not seen by the flush hook
+        return items
+
+    def upsert_stock_item(
+        self,
+        hogar_id: int,
+        fk_producto_maestro: int,
+        fk_ubicacion: int,
+        cantidad_actual: int,
+        fecha_caducidad: date,
+        estado_producto: str = 'cerrado',
+        **fields
+    ) -> InventoryStock:
+        """Add `cantidad_actual` units to the row with this grouping key, creating it if needed. Does not commit."""
+        return self.upsert_stock_items([dict(
             hogar_id=hogar_id,
             fk_producto_maestro=fk_producto_maestro,
             fk_ubicacion=fk_ubicacion,
             cantidad_actual=cantidad_actual,
             fecha_caducidad=fecha_caducidad,
             estado_producto=estado_producto,
-            fecha_congelacion=fecha_congelacion
+            **fields
+        )])[0]
+
+    def _dialect_insert(self):
+        """Dialect-specific insert() supporting ON CONFLICT, or None."""
+        dialect = self.db.get_bind().dialect.name
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert
+        elif dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            return None
+        return insert
+
+    def _find_and_increment(self, row: dict) -> InventoryStock:
+        item = self.find_stock_item(
+            hogar_id=row["hogar_id"],
+            producto_maestro_id=row["fk_producto_maestro"],
+            ubicacion_id=row["fk_ubicacion"],
+            fecha_caducidad=row["fecha_caducidad"],
+            estado_producto=row.get("estado_producto", 'cerrado')
         )
-        self.db.add(new_item)
-        self.db.commit()
-        self.db.refresh(new_item)
-        return new_item
+        if item:
+            item.cantidad_actual += row["cantidad_actual"]
+        else:
+            item = InventoryStock(**row)
+            self.db.add(item)
+        self.db.flush()
+        return item
 
-    def find_stock_item(self, hogar_id: int, producto_maestro_id: int, ubicacion_id: int, fecha_caducidad: date) -> InventoryStock | None:
+    def find_stock_item(self, hogar_id: int, producto_maestro_id: int, ubicacion_id: int, fecha_caducidad: date, estado_producto: str | None = None) -> InventoryStock | None:
         """
-        Find specific stock item by product, location, household and expiration date.
-        This is key for grouping logic.
+        Find specific stock item by product, location, household and expiration date
+        (and state, to match the full grouping key).
         """
-        return self.db.query(InventoryStock).filter(
+        query = self.db.query(InventoryStock).filter(
             and_(
                 InventoryStock.hogar_id == hogar_id,
                 InventoryStock.fk_producto_maestro == producto_maestro_id,
                 InventoryStock.fk_ubicacion == ubicacion_id,
                 InventoryStock.fecha_caducidad == fecha_caducidad
             )
-        ).first()
+        )
+        if estado_producto is not None:
+            query = query.filter(InventoryStock.estado_producto == estado_producto)
+        return query.first()
 
-    def get_alertas_caducidad_for_hogar(self, days: int, hogar_id: int) -> list[InventoryStock]:
+    def find_stock_items(self, hogar_id: int, producto_ids: set[int], ubicacion_ids: set[int], fechas: set[date]) -> list[InventoryStock]:
         """
-        Get expiration alerts for a household.
+        Set-based variant of find_stock_item: candidate rows for many
+        (product, location, expiration date) keys in one query. The caller
+        matches exact keys in memory.
+        """
+        return (
+            self.db.query(InventoryStock)
+            .filter(
+                InventoryStock.hogar_id == hogar_id,
+                InventoryStock.fk_producto_maestro.in_(producto_ids),
+                InventoryStock.fk_ubicacion.in_(ubicacion_ids),
+                InventoryStock.fecha_caducidad.in_(fechas)
+            )
+            .order_by(InventoryStock.id_stock)
+            .all()
+        )
+
+    def get_alertas_caducidad_for_hogar(self, days: int, hogar_id: int, limit: int | None = None, offset: int = 0) -> list[Row]:
+        """
+        Get expiration alerts for a household, as STOCK_ROW_COLUMNS rows.
         
         Rules:
         - EXCLUDES frozen products (estado_producto='congelado')
-        - INCLUDES unfrozen products ALWAYS (highest priority - need quick consumption)
-        - INCLUDES opened products ALWAYS (regardless of days)
-        - INCLUDES products (opened or closed) expiring in <= days
+        - INCLUDES products (opened, closed or unfrozen) expiring in <= days
         - INCLUDES already expired products
         
-        Priority order:
-        1. Unfrozen (descongelado) - most urgent
-        2. Expired or expiring soon
-        3. Opened
+        Ordered in SQL, so `limit`/`offset` return the most urgent items first:
+        1. By expiry date (expired/urgent/soon)
+        2. By state within same expiry date (descongelado > abierto > cerrado)
+        Served by the partial index ix_stock_alertas (hogar_id, fecha_caducidad) WHERE estado_producto <> 'congelado'.
         """
-        today = date.today()
-        limit_date = today + timedelta(days=days)
+        limit_date = date.today() + timedelta(days=days)
 
-        # Get all non-frozen products within expiry window
-        items = (
-            self.db.query(InventoryStock)
-            .options(
-                joinedload(InventoryStock.producto_maestro),
-                joinedload(InventoryStock.ubicacion)
-            )
+        query = (
+            self._stock_rows_query()
             .filter(
                 InventoryStock.hogar_id == hogar_id,
-                InventoryStock.estado_producto != 'congelado',  # EXCLUDE frozen
+                InventoryStock.estado_producto != 'congelado',  # EXCLUDE frozen (matches the partial index)
                 InventoryStock.fecha_caducidad <= limit_date  # Only soon-expiring items
             )
-            .all()
+            .order_by(
+                InventoryStock.fecha_caducidad,
+                case(_ALERT_STATE_PRIORITY, value=InventoryStock.estado_producto, else_=2),
+                InventoryStock.id_stock,
+            )
         )
-        
-        # Sort with multi-level priority:
-        # 1. By expiry date (expired/urgent/soon)
-        # 2. By state within same expiry date (descongelado > abierto > cerrado)
-        def sort_key(item):
-            # Primary: expiry date (most urgent first)
-            days_until_expiry = (item.fecha_caducidad - today).days
-            
-            # Secondary: state priority
-            # 0 = descongelado (highest priority)
-            # 1 = abierto (medium priority) 
-            # 2 = cerrado (lowest priority)
-            state_priority = {
-                'descongelado': 0,
-                'abierto': 1,
-                'cerrado': 2
-            }.get(item.estado_producto, 2)  # Default to cerrado priority
-            
-            return (days_until_expiry, state_priority)
-        
-        return sorted(items, key=sort_key)
+        if offset:
+            query = query.offset(offset)
+        if limit is not None:
+            query = query.limit(limit)
+        return query.all()
+
+    def get_stock_items_by_ids(self, ids: set[int], hogar_id: int) -> list[InventoryStock]:
+        """Get several stock items (with product and location) within a household."""
+        return self.db.query(InventoryStock).options(
+            joinedload(InventoryStock.producto_maestro),
+            joinedload(InventoryStock.ubicacion)
+        ).filter(
+            InventoryStock.id_stock.in_(ids),
+            InventoryStock.hogar_id == hogar_id
+        ).all()
 
     def get_stock_item_by_id_and_hogar(self, id_stock: int, hogar_id: int) -> InventoryStock | None:
         """Get stock item by ID within a household."""
@@ -103,26 +229,73 @@ class StockRepository:
             InventoryStock.hogar_id == hogar_id
         ).first()
 
-    def get_all_stock_for_hogar(self, hogar_id: int, search_term: str | None = None, status_filter: list[str] | None = None, sort_by: str | None = None) -> list[InventoryStock]:
+    def get_all_stock_for_hogar(self, hogar_id: int, search_term: str | None = None, status_filter: list[str] | None = None, sort_by: str | None = None) -> list[Row]:
         """
-        Get all stock items for a household, with optional search, status filtering, and sorting.
+        Get all stock items for a household (STOCK_ROW_COLUMNS rows), with optional search, status filtering, and sorting.
         """
-        query = (
-            self.db.query(InventoryStock)
-            .options(
-                joinedload(InventoryStock.ubicacion)  # Keep joinedload for location
-            )
-            .join(Product)  # Explicit JOIN with Product
-            .filter(InventoryStock.hogar_id == hogar_id)
+        query = self._filtered_stock_query(hogar_id, search_term, status_filter)
+        return query.order_by(*self._order_by(sort_by)).all()
+
+    def get_stock_page(
+        self,
+        hogar_id: int,
+        search_term: str | None = None,
+        status_filter: list[str] | None = None,
+        sort_by: str | None = None,
+        limit: int = 50,
+        after: tuple | None = None
+    ) -> list[Row]:
+        """
+        Keyset page of the household stock: up to `limit` rows following the row whose
+        sort key is `after` (see stock_sort_key). Uses a row-value comparison on the
+        sort columns plus id_stock, never OFFSET, so every page costs the same.
+        """
+        query = self._filtered_stock_query(hogar_id, search_term, status_filter)
+        if after is not None:
+            columns, descending = self._sort_spec(sort_by)
+            keys = tuple_(*columns, InventoryStock.id_stock)
+            query = query.filter(keys < tuple_(*after) if descending else keys > tuple_(*after))
+        return query.order_by(*self._order_by(sort_by)).limit(limit).all()
+
+    @classmethod
+    def sort_columns(cls, sort_by: str | None) -> list:
+        """Columns of the keyset for a sort mode (sort columns plus the id_stock tie-breaker)."""
+        columns, _ = cls._sort_spec(sort_by)
+        return [*columns, InventoryStock.id_stock]
+
+    @classmethod
+    def stock_sort_key(cls, row: Row, sort_by: str | None) -> tuple:
+        """Values of the keyset columns for a STOCK_ROW_COLUMNS row."""
+        return tuple(getattr(row, column.key) for column in cls.sort_columns(sort_by))
+
+    @staticmethod
+    def _sort_spec(sort_by: str | None) -> tuple[list, bool]:
+        return _SORT_MODES.get(sort_by, _DEFAULT_SORT)
+
+    @classmethod
+    def _order_by(cls, sort_by: str | None) -> list:
+        columns, descending = cls._sort_spec(sort_by)
+        # id_stock keeps the order stable between rows with equal sort values
+        return [c.desc() if descending else c.asc() for c in (*columns, InventoryStock.id_stock)]
+
+    def _stock_rows_query(self):
+        return (
+            self.db.query(*STOCK_ROW_COLUMNS)
+            .select_from(InventoryStock)
+            .join(InventoryStock.producto_maestro)
+            .join(InventoryStock.ubicacion)
         )
 
-        # 1. Unified Search (Name, Brand, Barcode)
+    def _filtered_stock_query(self, hogar_id: int, search_term: str | None, status_filter: list[str] | None):
+        query = self._stock_rows_query().filter(InventoryStock.hogar_id == hogar_id)
+
+        # 1. Unified Search (Name, Brand, Barcode) - served by the pg_trgm GIN indexes on Postgres
         if search_term:
-            search = f"%{search_term.lower()}%"
+            search = contains_pattern(search_term.lower())
             query = query.filter(
-                (Product.nombre.ilike(search)) |
-                (Product.marca.ilike(search)) |
-                (Product.barcode.ilike(search))
+                (Product.nombre.ilike(search, escape=LIKE_ESCAPE)) |
+                (Product.marca.ilike(search, escape=LIKE_ESCAPE)) |
+                (Product.barcode.ilike(search, escape=LIKE_ESCAPE))
             )
 
         # 2. Status Filtering (AND Logic)
@@ -136,7 +309,7 @@ class StockRepository:
                     query = query.filter(InventoryStock.estado_producto == 'abierto')
                 elif status == 'urgente':
                     # Red: 0 <= days <= 5. Exclude frozen.
-                    limit_date = today + timedelta(days=5)
+                    limit_date = today + timedelta(days=URGENT_DAYS)
                     query = query.filter(
                         and_(
                             InventoryStock.estado_producto != 'congelado',
@@ -146,8 +319,8 @@ class StockRepository:
                     )
                 elif status == 'por_caducar':
                     # Yellow: 5 < days <= 10. Exclude frozen.
-                    start_date = today + timedelta(days=5)
-                    end_date = today + timedelta(days=10)
+                    start_date = today + timedelta(days=URGENT_DAYS)
+                    end_date = today + timedelta(days=EXPIRING_DAYS)
                     query = query.filter(
                         and_(
                             InventoryStock.estado_producto != 'congelado',
@@ -164,28 +337,104 @@ class StockRepository:
                         )
                     )
 
-        # 3. Sorting
-        if sort_by:
-            if sort_by == 'expiry_asc':
-                query = query.order_by(InventoryStock.fecha_caducidad.asc())
-            elif sort_by == 'expiry_desc':
-                query = query.order_by(InventoryStock.fecha_caducidad.desc())
-            elif sort_by == 'name_asc':
-                query = query.order_by(Product.nombre.asc())
-            elif sort_by == 'name_desc':
-                query = query.order_by(Product.nombre.desc())
-            elif sort_by == 'quantity_asc':
-                query = query.order_by(InventoryStock.cantidad_actual.asc())
-            elif sort_by == 'quantity_desc':
-                query = query.order_by(InventoryStock.cantidad_actual.desc())
-            else:
-                # Default sort
-                query = query.order_by(Product.nombre, InventoryStock.fecha_caducidad)
-        else:
-            # Default sort
-            query = query.order_by(Product.nombre, InventoryStock.fecha_caducidad)
+        return query
 
-        return query.all()
+    def get_stock_summary_rows(self, hogar_id: int, today: date) -> list[Row]:
+        """
+        Stock counts of a household in one grouped query: one row per
+        (location, estado_producto, expiry bucket) with `items` (stock rows) and
+        `unidades` (sum of quantities). Buckets match the status filter of the listing;
+        the bucket is None for frozen items and items expiring later. Locations without
+        stock appear once with items = 0.
+        """
+        bucket = case(
+            (InventoryStock.estado_producto == 'congelado', None),
+            (InventoryStock.fecha_caducidad < today, 'caducado'),
+            (InventoryStock.fecha_caducidad <= today + timedelta(days=URGENT_DAYS), 'urgente'),
+            (InventoryStock.fecha_caducidad <= today + timedelta(days=EXPIRING_DAYS), 'por_caducar'),
+            else_=None,
+        )
+        # The bucket is computed in a subquery so GROUP BY does not repeat the CASE (and its parameters)
+        stock = (
+            select(InventoryStock.fk_ubicacion, InventoryStock.estado_producto, InventoryStock.cantidad_actual, bucket.label('bucket'))
+            .where(InventoryStock.hogar_id == hogar_id)
+            .subquery()
+        )
+        return self.db.execute(
+            select(
+                Location.id_ubicacion,
+                Location.nombre,
+                stock.c.estado_producto,
+                stock.c.bucket,
+                func.count(stock.c.fk_ubicacion).label('items'),
+                func.coalesce(func.sum(stock.c.cantidad_actual), 0).label('unidades'),
+            )
+            .select_from(Location)
+            .outerjoin(stock, stock.c.fk_ubicacion == Location.id_ubicacion)
+            .where(Location.hogar_id == hogar_id)
+            .group_by(Location.id_ubicacion, Location.nombre, stock.c.estado_producto, stock.c.bucket)
+            .order_by(Location.nombre, Location.id_ubicacion)
+        ).all()
+
+    def subtract_stock_quantity(self, id_stock: int, hogar_id: int, cantidad: int) -> int | None:
+        """
+        Atomically take `cantidad` units from a stock item (see subtract_stock_quantities).
+        Returns the new quantity (0 = deleted), or None if the item is not in the household
+        or has fewer units (nothing changes then). Does not commit.
+        """
+        return self.subtract_stock_quantities(hogar_id, {id_stock: cantidad}).get(id_stock)
+
+    def subtract_stock_quantities(self, hogar_id: int, amounts: dict[int, int]) -> dict[int, int]:
+        """
+        Atomically take units from several stock items ({id_stock: cantidad}) with one
+        UPDATE ... SET cantidad_actual = cantidad_actual - CASE id_stock ... END
+        WHERE ... AND cantidad_actual >= CASE id_stock ... END RETURNING,
+        then one DELETE for the rows that reached zero.
+
+        Returns {id_stock: new quantity} (0 = deleted) for the items that changed; items
+        missing from the household or with fewer units are left untouched and omitted.
+        Updated rows stay locked until commit, so concurrent calls are serialized by the
+        database and never go below zero. Does not commit.
+        """
+        if not amounts:
+            return {}
+        cantidad = case(amounts, value=InventoryStock.id_stock)
+        result = self.db.execute(
+            update(InventoryStock)
+            .where(
+                InventoryStock.id_stock.in_(list(amounts)),
+                InventoryStock.hogar_id == hogar_id,
+                InventoryStock.cantidad_actual >= cantidad,
+            )
+            .values(cantidad_actual=InventoryStock.cantidad_actual - cantidad)
+            .returning(InventoryStock.id_stock, InventoryStock.cantidad_actual)
+            .execution_options(synchronize_session=False)
+        )
+        new_quantities = {id_stock: quantity for id_stock, quantity in result}
+
+        emptied = [id_stock for id_stock, quantity in new_quantities.items() if quantity <= 0]
+        if emptied:
+            self.db.execute(
+                delete(InventoryStock)
+                .where(InventoryStock.id_stock.in_(emptied))
+                .execution_options(synchronize_session=False)
+            )
+        # Core statements: not seen by the flush hook
+        for id_stock, quantity in new_quantities.items():
+            record_change(self.db, hogar_id, 'stock', id_stock, 'delete' if quantity <= 0 else 'upsert')
+        return new_quantities
+
+    def get_stock_quantity(self, id_stock: int, hogar_id: int) -> int | None:
+        """Current quantity of a stock item in the household, or None if it does not exist."""
+        return self.get_stock_quantities({id_stock}, hogar_id).get(id_stock)
+
+    def get_stock_quantities(self, ids: set[int], hogar_id: int) -> dict[int, int]:
+        """Current quantities {id_stock: cantidad} of the given items that exist in the household."""
+        rows = self.db.execute(
+            select(InventoryStock.id_stock, InventoryStock.cantidad_actual)
+            .where(InventoryStock.id_stock.in_(list(ids)), InventoryStock.hogar_id == hogar_id)
+        )
+        return {id_stock: quantity for id_stock, quantity in rows}
 
     def delete_stock_item(self, item: InventoryStock):
         """Delete a stock item."""
@@ -0,0 +1,26 @@
+# backend/repositories/text_search.py
+"""
+Helpers for substring search on catalog text columns.
+
+On Postgres, `ILIKE '%term%'` and the `%` similarity operator are served by the
+pg_trgm GIN indexes (see database/migrations/2026-10-17_add_trigram_search.sql).
+Other backends fall back to plain LIKE scans.
+"""
+from sqlalchemy.orm import Session
+
+LIKE_ESCAPE = "\\"
+
+
+def contains_pattern(term: str) -> str:
+    """`%term%` with LIKE wildcards in the user's input escaped (use with escape=LIKE_ESCAPE)."""
+    escaped = (
+        term.replace(LIKE_ESCAPE, LIKE_ESCAPE * 2)
+        .replace("%", LIKE_ESCAPE + "%")
+        .replace("_", LIKE_ESCAPE + "_")
+    )
+    return f"%{escaped}%"
+
+
+def supports_trigram(db: Session) -> bool:
+    """Whether the session's backend has pg_trgm (similarity ranking and fuzzy matching)."""
+    return db.get_bind().dialect.name == "postgresql"
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from . import locations, stock, alerts, products, product_actions, hogares
+from . import locations, stock, alerts, products, product_actions, hogares, sync
 
 # Este es el router principal que será incluido en main.py.
 # Manejará el prefijo "/inventory" para todas las rutas relacionadas.
@@ -12,4 +12,5 @@ router.include_router(stock.router, prefix="/stock", tags=["Stock"])
 router.include_router(alerts.router, prefix="/alertas", tags=["Alerts"])
 router.include_router(products.router, prefix="/products", tags=["Products"])
 router.include_router(product_actions.router, tags=["Product Actions"])  # No prefix, already in router
-router.include_router(hogares.router)  # Prefix defined in router itself (/hogares)
\ No newline at end of file
+router.include_router(hogares.router)  # Prefix defined in router itself (/hogares)
+router.include_router(sync.router, prefix="/sync", tags=["Sync"])
\ No newline at end of file
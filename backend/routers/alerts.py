@@ -1,22 +1,35 @@
 # backend/routers/alerts.py
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
-from database import get_db
+from fastapi import APIRouter, Depends, Query, Request, Response
+from database import DBSession, get_session
 from schemas import AlertResponse
 from services import AlertService
 from dependencies import get_active_hogar_id
+from http_cache import conditional_response
+from fast_json import raw_json_response
 
 router = APIRouter()
 
-def get_alert_service(db: Session = Depends(get_db)):
-    return AlertService(db)
+def get_alert_service(db: DBSession = Depends(get_session)):
+    return db.service(AlertService)
 
 @router.get("/proxima-semana", response_model=AlertResponse)
-def get_alerts_endpoint(
+async def get_alerts_endpoint(
+    request: Request,
+    response: Response,
+    limit: int | None = Query(None, ge=1, le=200, description="Return only the N most urgent alerts"),
+    offset: int = Query(0, ge=0),
+    db: DBSession = Depends(get_session),
     service: AlertService = Depends(get_alert_service),
     hogar_id: int = Depends(get_active_hogar_id)
 ):
     """
-    Get alerts for products expiring in the next 10 days or already expired.
+    Get alerts for products expiring in the next 10 days or already expired, most urgent first.
+    Use 'limit' (and 'offset') to fetch only the top N; 'hay_mas' tells whether more follow.
+    Supports If-None-Match: answers 304 while the household is unchanged (and the day has not changed).
+    Otherwise the encoded response is served from a per-household cache (see /health/caches, "alerts").
     """
-    return service.get_expiring_alerts_for_hogar(days=10, hogar_id=hogar_id)
+    not_modified = await conditional_response(request, response, db, hogar_id, "alertas", 10, limit, offset)
+    if not_modified:
+        return not_modified
+    body = await service.get_expiring_alerts_json(10, hogar_id, request.state.hogar_version, limit, offset)
+    return raw_json_response(body, response)
@@ -1,79 +1,106 @@
 # backend/routers/hogares.py
 """API endpoints for household management."""
 
+from datetime import datetime, timezone
 from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
 from typing import List
 
-from database import get_db
+from database import DBSession, get_session
 from auth.firebase_auth import get_current_user_id
-from dependencies import get_active_hogar_id, require_admin_role
+from auth.hogar_token import issue_hogar_token
+from dependencies import resolve_membership, require_admin_role
 from services.hogar_service import HogarService
 from schemas.hogar import (
     HogarCreate, HogarUpdate, HogarSchema, HogarDetalle,
-    HogarMiembroCreate, HogarMiembroUpdate, InvitacionResponse
+    HogarMiembroCreate, HogarMiembroUpdate, InvitacionResponse, HogarTokenResponse
 )
 
 router = APIRouter(prefix="/hogares", tags=["Hogares"])
 
 
 @router.post("", response_model=HogarSchema, status_code=status.HTTP_201_CREATED)
-def create_hogar(
+async def create_hogar(
     hogar_data: HogarCreate,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Create a new household.
     
     The user creating the household automatically becomes an admin.
     """
-    service = HogarService(db)
-    return service.create_hogar(hogar_data, user_id)
+    service = db.service(HogarService)
+    return await service.create_hogar(hogar_data, user_id)
 
 
 @router.get("", response_model=List[HogarSchema])
-def list_hogares(
+async def list_hogares(
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Get all households where the current user is a member.
     
     Returns household information including the user's role in each.
     """
-    service = HogarService(db)
-    return service.get_hogares_usuario(user_id)
+    service = db.service(HogarService)
+    return await service.get_hogares_usuario(user_id)
 
 
 @router.get("/{hogar_id}", response_model=HogarDetalle)
 async def get_hogar_detalle(
     hogar_id: int,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Get detailed information about a household.
     
     Requires: User must be a member of the household (checked by dependency).
     """
-    # Verify access using await since get_active_hogar_id is async
-    verified_hogar_id = await get_active_hogar_id(
-        x_hogar_id=hogar_id,
-        user_id=user_id,
-        db=db
-    )
+    membership = await resolve_membership(user_id, hogar_id, db)
     
-    service = HogarService(db)
-    return service.get_hogar_detalle(verified_hogar_id, user_id)
+    service = db.service(HogarService)
+    return await service.get_hogar_detalle(membership.hogar_id, user_id)
+
+
+@router.post("/{hogar_id}/token", response_model=HogarTokenResponse)
+async def emitir_token_hogar(
+    hogar_id: int,
+    user_id: str = Depends(get_current_user_id),
+    db: DBSession = Depends(get_session)
+):
+    """
+    Exchange the Firebase token for a short-lived household session token.
+    
+    Send it as `X-Hogar-Token` on household-scoped endpoints to skip Firebase
+    verification and the membership lookup. It is revoked when the member's
+    role changes or they leave the household; request a new one on 401.
+    
+    Requires: User must be a member of the household.
+    """
+    membership = await resolve_membership(user_id, hogar_id, db)
+    token, expires_at = issue_hogar_token(
+        user_id=membership.user_id,
+        hogar_id=membership.hogar_id,
+        id_miembro=membership.id_miembro,
+        rol=membership.rol,
+        version=membership.token_version
+    )
+    return HogarTokenResponse(
+        token=token,
+        hogar_id=membership.hogar_id,
+        rol=membership.rol,
+        expires_at=datetime.fromtimestamp(expires_at, tz=timezone.utc)
+    )
 
 
 @router.put("/{hogar_id}", response_model=HogarSchema)
-def update_hogar(
+async def update_hogar(
     hogar_id: int,
     hogar_data: HogarUpdate,
     auth_data: tuple = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Update household information (name, icon).
@@ -81,15 +108,15 @@ def update_hogar(
     Requires: Admin role.
     """
     verified_hogar_id, _ = auth_data
-    service = HogarService(db)
-    return service.update_hogar(verified_hogar_id, hogar_data)
+    service = db.service(HogarService)
+    return await service.update_hogar(verified_hogar_id, hogar_data)
 
 
 @router.delete("/{hogar_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_hogar(
+async def delete_hogar(
     hogar_id: int,
     auth_data: tuple = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Delete a household.
@@ -99,23 +126,23 @@ def delete_hogar(
     Requires: Admin role.
     """
     verified_hogar_id, _ = auth_data
-    service = HogarService(db)
-    service.delete_hogar(verified_hogar_id)
+    service = db.service(HogarService)
+    await service.delete_hogar(verified_hogar_id)
 
 
 @router.post("/unirse", response_model=HogarSchema)
-def unirse_a_hogar(
+async def unirse_a_hogar(
     member_data: HogarMiembroCreate,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Join a household using an invitation code.
     
     The user will be added as a 'miembro' (member) by default.
     """
-    service = HogarService(db)
-    return service.unirse_a_hogar(
+    service = db.service(HogarService)
+    return await service.unirse_a_hogar(
         codigo=member_data.codigo_invitacion,
         user_id=user_id,
         apodo=member_data.apodo
@@ -123,10 +150,10 @@ def unirse_a_hogar(
 
 
 @router.post("/{hogar_id}/invitacion/regenerar", response_model=InvitacionResponse)
-def regenerar_codigo_invitacion(
+async def regenerar_codigo_invitacion(
     hogar_id: int,
     auth_data: tuple = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Generate a new invitation code for the household.
@@ -136,13 +163,13 @@ def regenerar_codigo_invitacion(
     Requires: Admin role.
     """
     verified_hogar_id, _ = auth_data
-    service = HogarService(db)
-    nuevo_codigo = service.regenerar_codigo_invitacion(verified_hogar_id)
+    service = db.service(HogarService)
+    nuevo_codigo = await service.regenerar_codigo_invitacion(verified_hogar_id)
     
     # Get hogar name for response
     from repositories.hogar_repository import HogarRepository
-    repo = HogarRepository(db)
-    hogar = repo.get_hogar_by_id(verified_hogar_id)
+    repo = db.service(HogarRepository)
+    hogar = await repo.get_hogar_by_id(verified_hogar_id)
     
     return InvitacionResponse(
         codigo_invitacion=nuevo_codigo,
@@ -151,11 +178,11 @@ def regenerar_codigo_invitacion(
 
 
 @router.delete("/{hogar_id}/miembros/{user_id_to_remove}", status_code=status.HTTP_204_NO_CONTENT)
-def expulsar_miembro(
+async def expulsar_miembro(
     hogar_id: int,
     user_id_to_remove: str,
     auth_data: tuple = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Remove a member from the household.
@@ -166,15 +193,15 @@ def expulsar_miembro(
     Requires: Admin role.
     """
     verified_hogar_id, admin_user_id = auth_data
-    service = HogarService(db)
-    service.expulsar_miembro(verified_hogar_id, user_id_to_remove, admin_user_id)
+    service = db.service(HogarService)
+    await service.expulsar_miembro(verified_hogar_id, user_id_to_remove, admin_user_id)
 
 
 @router.post("/{hogar_id}/abandonar", status_code=status.HTTP_204_NO_CONTENT)
-def abandonar_hogar(
+async def abandonar_hogar(
     hogar_id: int,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Leave a household.
@@ -183,17 +210,17 @@ def abandonar_hogar(
     
     Note: Uses hogar_id from path, not from X-Hogar-Id header.
     """
-    service = HogarService(db)
-    service.abandonar_hogar(hogar_id, user_id)
+    service = db.service(HogarService)
+    await service.abandonar_hogar(hogar_id, user_id)
 
 
 @router.put("/{hogar_id}/miembros/{user_id_target}/rol", status_code=status.HTTP_204_NO_CONTENT)
-def cambiar_rol_miembro(
+async def cambiar_rol_miembro(
     hogar_id: int,
     user_id_target: str,
     member_data: HogarMiembroUpdate,
     auth_data: tuple = Depends(require_admin_role),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Change a member's role in the household.
@@ -211,16 +238,16 @@ def cambiar_rol_miembro(
             detail="Debe especificar el nuevo rol"
         )
     
-    service = HogarService(db)
-    service.cambiar_rol_miembro(verified_hogar_id, user_id_target, member_data.rol)
+    service = db.service(HogarService)
+    await service.cambiar_rol_miembro(verified_hogar_id, user_id_target, member_data.rol)
 
 
 @router.put("/{hogar_id}/miembros/mi-apodo", status_code=status.HTTP_204_NO_CONTENT)
-def actualizar_mi_apodo(
+async def actualizar_mi_apodo(
     hogar_id: int,
     member_data: HogarMiembroUpdate,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """
     Update your own nickname in the household.
@@ -234,5 +261,5 @@ def actualizar_mi_apodo(
             detail="Debe especificar el nuevo apodo"
         )
     
-    service = HogarService(db)
-    service.actualizar_apodo_miembro(hogar_id, user_id, member_data.apodo)
+    service = db.service(HogarService)
+    await service.actualizar_apodo_miembro(hogar_id, user_id, member_data.apodo)
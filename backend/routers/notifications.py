@@ -1,34 +1,34 @@
 # backend/routers/notifications.py
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Query, status, Header
 from sqlalchemy.orm import Session
-from database import get_db
+from database import DBSession, get_db, get_session
 from auth.firebase_auth import get_current_user_id
-from services.notification_service import NotificationService
+from services.notification_service import NotificationService, drain_notification_outbox
 from schemas.notification import DeviceRegisterRequest, PreferenceUpdateRequest, PreferenceResponse
 import os
 
 router = APIRouter()
 
 @router.post("/device", status_code=status.HTTP_201_CREATED)
-def register_device(
+async def register_device(
     request: DeviceRegisterRequest,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """Register a user device for push notifications."""
-    service = NotificationService(db)
-    service.register_device(user_id, request.fcm_token, request.platform)
+    service = db.service(NotificationService)
+    await service.register_device(user_id, request.fcm_token, request.platform)
     return {"status": "registered"}
 
 @router.post("/preferences")
-def update_preferences(
+async def update_preferences(
     request: PreferenceUpdateRequest,
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """Update user notification preferences."""
-    service = NotificationService(db)
-    service.update_preferences(
+    service = db.service(NotificationService)
+    await service.update_preferences(
         user_id, 
         request.notifications_enabled, 
         request.notification_time, 
@@ -37,17 +37,25 @@ def update_preferences(
     return {"status": "updated"}
 
 @router.get("/preferences", response_model=PreferenceResponse)
-def get_preferences(
+async def get_preferences(
     user_id: str = Depends(get_current_user_id),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """Get user notification preferences."""
-    service = NotificationService(db)
-    return service.get_preferences(user_id)
+    service = db.service(NotificationService)
+    return await service.get_preferences(user_id)
+
+def _check_cron_secret(authorization: str | None):
+    cron_secret = os.getenv("CRON_SECRET", "default_secret_change_me")
+    expected_header = f"Bearer {cron_secret}"
+    
+    if not authorization or authorization != expected_header:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Cron Secret")
 
 # Cron endpoint - Protected by Secret
 @router.post("/cron/trigger-notifications")
 def trigger_notifications(
+    background_tasks: BackgroundTasks,
     authorization: str = Header(None),
     db: Session = Depends(get_db)
 ):
@@ -55,13 +63,41 @@ def trigger_notifications(
     Trigger daily notifications. 
     Protected by CRON_SECRET env var.
     Intended to be called by GitHub Actions or external scheduler.
+    Only enqueues them (idempotent per user and day); delivery runs after the response.
     """
-    cron_secret = os.getenv("CRON_SECRET", "default_secret_change_me")
-    expected_header = f"Bearer {cron_secret}"
-    
-    if not authorization or authorization != expected_header:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid Cron Secret")
+    _check_cron_secret(authorization)
     
     service = NotificationService(db)
     result = service.trigger_daily_notifications()
+    if result["enqueued"]:
+        background_tasks.add_task(drain_notification_outbox)
     return result
+
+@router.post("/cron/drain-notifications")
+def drain_notifications(
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Deliver the pending notifications that are due (first attempts and retries).
+    Protected by CRON_SECRET env var. Safe to run concurrently; intended to run every few minutes.
+    """
+    _check_cron_secret(authorization)
+    
+    return NotificationService(db).drain_outbox()
+
+@router.post("/cron/prune-devices")
+def prune_devices(
+    days: int | None = Query(None, ge=1, description="Inactivity threshold; defaults to FCM_TOKEN_STALE_DAYS"),
+    authorization: str = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Delete devices whose token was not registered again in `days` days.
+    Protected by CRON_SECRET env var. Intended to run daily.
+    """
+    _check_cron_secret(authorization)
+    
+    service = NotificationService(db)
+    deleted = service.prune_stale_devices(days) if days else service.prune_stale_devices()
+    return {"status": "success", "devices_deleted": deleted}
@@ -4,8 +4,7 @@ Router for product state management actions.
 Handles opening, freezing, unfreezing, and relocating products.
 """
 from fastapi import APIRouter, Depends, status
-from sqlalchemy.orm import Session
-from database import get_db
+from database import DBSession, get_session
 from dependencies import require_miembro_or_admin_role
 from services import ProductActionsService
 from schemas import (
@@ -19,8 +18,8 @@ from schemas import (
 router = APIRouter(prefix="/stock", tags=["Product Actions"])
 
 
-def get_product_actions_service(db: Session = Depends(get_db)):
-    return ProductActionsService(db)
+def get_product_actions_service(db: DBSession = Depends(get_session)):
+    return db.service(ProductActionsService)
 
 
 @router.post(
@@ -37,7 +36,7 @@ def get_product_actions_service(db: Session = Depends(get_db)):
     The original item quantity is decremented accordingly.
     """
 )
-def open_product(
+async def open_product(
     stock_id: int,
     request: OpenProductRequest,
     service: ProductActionsService = Depends(get_product_actions_service),
@@ -45,7 +44,7 @@ def open_product(
 ):
     """Open sealed product units. Requires member or admin role."""
     hogar_id, user_id = auth_data
-    return service.open_product(
+    return await service.open_product(
         stock_id=stock_id,
         hogar_id=hogar_id,
         cantidad=request.cantidad,
@@ -69,7 +68,7 @@ def open_product(
     Frozen products will not appear in expiration alerts.
     """
 )
-def freeze_product(
+async def freeze_product(
     stock_id: int,
     request: FreezeProductRequest,
     service: ProductActionsService = Depends(get_product_actions_service),
@@ -77,7 +76,7 @@ def freeze_product(
 ):
     """Freeze product units. Requires member or admin role."""
     hogar_id, user_id = auth_data
-    return service.freeze_product(
+    return await service.freeze_product(
         stock_id=stock_id,
         hogar_id=hogar_id,
         cantidad=request.cantidad,
@@ -102,7 +101,7 @@ def freeze_product(
     ⚠️ Unfrozen products should be consumed quickly!
     """
 )
-def unfreeze_product(
+async def unfreeze_product(
     stock_id: int,
     request: UnfreezeProductRequest,
     service: ProductActionsService = Depends(get_product_actions_service),
@@ -110,7 +109,7 @@ def unfreeze_product(
 ):
     """Unfreeze product units. Requires member or admin role."""
     hogar_id, user_id = auth_data
-    return service.unfreeze_product(
+    return await service.unfreeze_product(
         stock_id=stock_id,
         hogar_id=hogar_id,
         cantidad=request.cantidad,
@@ -133,7 +132,7 @@ def unfreeze_product(
     Note: For opened products that need new expiration, use the 'open' endpoint instead.
     """
 )
-def relocate_product(
+async def relocate_product(
     stock_id: int,
     request: RelocateProductRequest,
     service: ProductActionsService = Depends(get_product_actions_service),
@@ -141,7 +140,7 @@ def relocate_product(
 ):
     """Relocate product to different location. Requires member or admin role."""
     hogar_id, user_id = auth_data
-    return service.relocate_product(
+    return await service.relocate_product(
         stock_id=stock_id,
         hogar_id=hogar_id,
         cantidad=request.cantidad,
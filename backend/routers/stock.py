@@ -1,45 +1,63 @@
 # backend/routers/stock.py
-from fastapi import APIRouter, Depends, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Request, Response, status, Query
 from typing import List
-from database import get_db
+from database import DBSession, get_session
 from schemas import (
-    StockItem, StockItemCreate, StockItemCreateFromScan,
-    StockUpdate, StockRemove,
+    StockItem, StockPage, StockItemCreate, StockItemCreateFromScan,
+    StockUpdate, StockRemove, StockBulkCreate, StockBulkResponse,
+    StockRemoveBatch, StockRemoveBatchResponse, StockSummary,
 )
 from services.stock_service import StockService
 from dependencies import get_active_hogar_id, require_miembro_or_admin_role
+from http_cache import conditional_response
+from fast_json import json_response
 
 router = APIRouter()
 
-def get_stock_service(db: Session = Depends(get_db)):
-    return StockService(db)
+def get_stock_service(db: DBSession = Depends(get_session)):
+    return db.service(StockService)
 
 @router.post("/manual", response_model=StockItem, status_code=status.HTTP_201_CREATED)
-def add_manual_stock_endpoint(
+async def add_manual_stock_endpoint(
     data: StockItemCreate, 
     service: StockService = Depends(get_stock_service),
     auth_data: tuple = Depends(require_miembro_or_admin_role)
 ):
     """Add stock manually. Requires member or admin role."""
     hogar_id, user_id = auth_data
-    return service.process_manual_stock(data, hogar_id, user_id)
+    return await service.process_manual_stock(data, hogar_id, user_id)
 
 @router.post("/from-scan", response_model=StockItem, status_code=status.HTTP_201_CREATED)
-def add_scan_stock_endpoint(
+async def add_scan_stock_endpoint(
     data: StockItemCreateFromScan, 
     service: StockService = Depends(get_stock_service),
     auth_data: tuple = Depends(require_miembro_or_admin_role)
 ):
     """Add stock from barcode scan. Requires member or admin role."""
     hogar_id, user_id = auth_data
-    return service.process_scan_stock(data, hogar_id, user_id)
+    return await service.process_scan_stock(data, hogar_id, user_id)
+
+@router.post("/bulk", response_model=StockBulkResponse, status_code=status.HTTP_200_OK)
+async def add_bulk_stock_endpoint(
+    data: StockBulkCreate,
+    service: StockService = Depends(get_stock_service),
+    auth_data: tuple = Depends(require_miembro_or_admin_role)
+):
+    """
+    Add many stock entries (manual or scanned) in one request and one transaction.
+    Returns a result per entry, in request order. Requires member or admin role.
+    """
+    hogar_id, user_id = auth_data
+    return await service.process_bulk_stock(data.items, hogar_id, user_id)
 
 @router.get("/", response_model=List[StockItem])
-def get_household_stock(
+async def get_household_stock(
+    request: Request,
+    response: Response,
     search: str | None = None,
     status: List[str] | None = Query(None),
     sort: str | None = None,
+    db: DBSession = Depends(get_session),
     service: StockService = Depends(get_stock_service),
     hogar_id: int = Depends(get_active_hogar_id)
 ):
@@ -48,31 +66,90 @@ def get_household_stock(
     Allows filtering by product name or barcode with the 'search' parameter.
     Allows filtering by status with 'status' parameter (cumulative).
     Allows sorting with 'sort' parameter.
+    Supports If-None-Match: answers 304 while the household is unchanged.
     """
-    return service.get_stock_for_hogar(hogar_id, search, status, sort)
+    not_modified = await conditional_response(request, response, db, hogar_id, "stock", search, status, sort)
+    if not_modified:
+        return not_modified
+    return json_response(await service.get_stock_for_hogar(hogar_id, search, status, sort), response)
+
+@router.get("/summary", response_model=StockSummary)
+async def get_household_stock_summary(
+    request: Request,
+    response: Response,
+    db: DBSession = Depends(get_session),
+    service: StockService = Depends(get_stock_service),
+    hogar_id: int = Depends(get_active_hogar_id)
+):
+    """
+    Counts (items and units) by state, by expiry bucket (caducado, urgente, por_caducar; same
+    boundaries as the 'status' filter) and by location, for the home screen.
+    Computed with one grouped query and cached per household version. Supports If-None-Match.
+    """
+    not_modified = await conditional_response(request, response, db, hogar_id, "stock-summary")
+    if not_modified:
+        return not_modified
+    return await service.get_stock_summary(hogar_id, request.state.hogar_version)
+
+@router.get("/page", response_model=StockPage)
+async def get_household_stock_page(
+    request: Request,
+    response: Response,
+    search: str | None = None,
+    status: List[str] | None = Query(None),
+    sort: str | None = None,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: str | None = None,
+    db: DBSession = Depends(get_session),
+    service: StockService = Depends(get_stock_service),
+    hogar_id: int = Depends(get_active_hogar_id)
+):
+    """
+    Get the household inventory one page at a time (keyset pagination).
+    Accepts the same 'search', 'status' and 'sort' parameters as the full listing.
+    Pass the returned 'next_cursor' as 'cursor' to get the next page; it is null on the last page.
+    Supports If-None-Match like the full listing.
+    """
+    not_modified = await conditional_response(request, response, db, hogar_id, "stock-page", search, status, sort, limit, cursor)
+    if not_modified:
+        return not_modified
+    return json_response(await service.get_stock_page(hogar_id, search, status, sort, limit, cursor), response)
 
 @router.patch("/{id_stock}/consume", status_code=200)
-def consume_one_item(
+async def consume_one_item(
     id_stock: int,
     service: StockService = Depends(get_stock_service),
     auth_data: tuple = Depends(require_miembro_or_admin_role)
 ):
     """Consume one unit of a stock item. If quantity reaches 0, the item is deleted. Requires member or admin role."""
     hogar_id, _ = auth_data
-    return service.consume_stock_item(id_stock, hogar_id)
+    return await service.consume_stock_item(id_stock, hogar_id)
 
 @router.post("/remove", status_code=200)
-def remove_stock_items(
+async def remove_stock_items(
     payload: StockRemove,
     service: StockService = Depends(get_stock_service),
     auth_data: tuple = Depends(require_miembro_or_admin_role)
 ):
     """Remove a specific quantity from a stock item. Requires member or admin role."""
     hogar_id, _ = auth_data
-    return service.remove_stock_quantity(payload.id_stock, payload.cantidad, hogar_id)
+    return await service.remove_stock_quantity(payload.id_stock, payload.cantidad, hogar_id)
+
+@router.post("/remove/batch", response_model=StockRemoveBatchResponse, status_code=200)
+async def remove_stock_batch(
+    payload: StockRemoveBatch,
+    service: StockService = Depends(get_stock_service),
+    auth_data: tuple = Depends(require_miembro_or_admin_role)
+):
+    """
+    Remove quantities from many stock items (e.g. clearing out a fridge) in one request and one transaction.
+    Items reaching 0 are deleted. Returns a result per entry, in request order. Requires member or admin role.
+    """
+    hogar_id, _ = auth_data
+    return await service.remove_stock_batch(payload.items, hogar_id)
 
 @router.patch("/{id_stock}", response_model=StockItem, status_code=200)
-def update_stock_item(
+async def update_stock_item(
     id_stock: int,
     payload: StockUpdate,
     service: StockService = Depends(get_stock_service),
@@ -80,4 +157,4 @@ def update_stock_item(
 ):
     """Update editable fields of a stock item: name/brand (master product), expiration date, quantity and location. Requires member or admin role."""
     hogar_id, _ = auth_data
-    return service.update_stock_item_details(id_stock, hogar_id, payload)
\ No newline at end of file
+    return await service.update_stock_item_details(id_stock, hogar_id, payload)
\ No newline at end of file
@@ -0,0 +1,77 @@
+# backend/routers/sync.py
+import asyncio
+import os
+import time
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
+from database import DBSession, get_session
+from schemas import SyncResponse
+from services.sync_service import SyncService
+from repositories.hogar_repository import HogarRepository
+from dependencies import get_active_hogar_id
+from realtime import change_broker
+
+router = APIRouter()
+
+# Cada cuánto se envía un comentario para mantener viva la conexión (proxies, Render)
+EVENTS_PING_SECONDS = float(os.getenv("EVENTS_PING_SECONDS", "25"))
+# El stream se cierra tras este tiempo para que el cliente se reconecte y se vuelva a autenticar
+EVENTS_MAX_SECONDS = float(os.getenv("EVENTS_MAX_SECONDS", "900"))
+
+def get_sync_service(db: DBSession = Depends(get_session)):
+    return db.service(SyncService)
+
+@router.get("", response_model=SyncResponse)
+async def sync_changes(
+    since: int = Query(..., ge=0, description="Last household version the client has (X-Hogar-Version or a previous sync)"),
+    service: SyncService = Depends(get_sync_service),
+    hogar_id: int = Depends(get_active_hogar_id)
+):
+    """
+    Delta sync: stock, locations, products and shopping-list rows changed since version `since`,
+    plus tombstones for deleted ones. Use the returned `version` as the next `since`.
+    If `reset` is true the client must reload everything instead.
+    """
+    return await service.get_changes_since(hogar_id, since)
+
+@router.get("/events")
+async def stream_changes(
+    request: Request,
+    db: DBSession = Depends(get_session),
+    hogar_id: int = Depends(get_active_hogar_id)
+):
+    """
+    Server-Sent Events stream of the household's changes.
+
+    Starts with a `ready` event carrying the current version, then one `change` event per
+    committed version (id = version). If a version is skipped (reconnect, slow client) or
+    `changes` is null, call GET /inventory/sync?since=<last version>.
+    """
+    # Suscribirse antes de leer la versión: ningún cambio posterior se pierde
+    queue = change_broker.subscribe(hogar_id)
+    try:
+        version = await db.service(HogarRepository).get_version(hogar_id) or 0
+        await db.close()  # el stream no debe retener una conexión del pool
+    except BaseException:
+        change_broker.unsubscribe(hogar_id, queue)
+        raise
+
+    async def events():
+        deadline = time.monotonic() + EVENTS_MAX_SECONDS
+        try:
+            yield f"event: ready\nid: {version}\ndata: {{\"hogar_id\":{hogar_id},\"version\":{version}}}\n\n"
+            while time.monotonic() < deadline and not await request.is_disconnected():
+                try:
+                    event_version, payload = await asyncio.wait_for(queue.get(), timeout=EVENTS_PING_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                yield f"event: change\nid: {event_version}\ndata: {payload}\n\n"
+        finally:
+            change_broker.unsubscribe(hogar_id, queue)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -2,20 +2,26 @@
 
 from .location import Location, LocationCreate
 from .item import (
-    StockItemCreate, StockItemCreateFromScan, StockItem, StockAlertItem,
+    StockItemCreate, StockItemCreateFromScan, StockItem, StockPage, StockAlertItem,
     ProductSchema, LocationSchema,
 )
 from .alert import AlertResponse
 from .stock_update import StockUpdate, StockRemove
+from .stock_bulk import (
+    StockBulkCreate, StockBulkResult, StockBulkResponse,
+    StockRemoveBatch, StockRemoveResult, StockRemoveBatchResponse,
+)
 from .product_update import ProductUpdate
 from .product_actions import (
     OpenProductRequest, FreezeProductRequest, UnfreezeProductRequest,
     RelocateProductRequest, ProductActionResponse
 )
+from .stock_summary import StockSummary, SummaryCount, SummaryByState, SummaryByExpiry, SummaryByLocation
+from .sync import SyncResponse, SyncDeleted
 from .hogar import (
     HogarCreate, HogarUpdate, HogarSchema, HogarDetalle, MiembroInfo,
     HogarMiembroCreate, HogarMiembroUpdate, HogarMiembroSchema,
-    InvitacionResponse
+    InvitacionResponse, HogarTokenResponse
 )
 
 __all__ = [
@@ -24,10 +30,22 @@ __all__ = [
     "StockItemCreate",
     "StockItemCreateFromScan",
     "StockItem",
+    "StockPage",
     "StockAlertItem",
     "AlertResponse",
     "StockUpdate",
     "StockRemove",
+    "StockBulkCreate",
+    "StockBulkResult",
+    "StockBulkResponse",
+    "StockRemoveBatch",
+    "StockRemoveResult",
+    "StockRemoveBatchResponse",
+    "StockSummary",
+    "SummaryCount",
+    "SummaryByState",
+    "SummaryByExpiry",
+    "SummaryByLocation",
     "ProductSchema",
     "LocationSchema",
     "ProductUpdate",
@@ -45,4 +63,7 @@ __all__ = [
     "HogarMiembroUpdate",
     "HogarMiembroSchema",
     "InvitacionResponse",
+    "HogarTokenResponse",
+    "SyncResponse",
+    "SyncDeleted",
 ]
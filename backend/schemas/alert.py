@@ -5,3 +5,5 @@ from .item import StockAlertItem
 
 class AlertResponse(BaseModel):
     productos_proximos_a_caducar: List[StockAlertItem] = []
+    # True si hay más alertas después de las devueltas (solo cuando se pide 'limit')
+    hay_mas: bool = False
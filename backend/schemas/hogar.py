@@ -87,3 +87,11 @@ class InvitacionResponse(BaseModel):
     codigo_invitacion: str
     hogar_nombre: str
     expira_en: Optional[str] = Field(None, description="Optional expiration info")
+
+
+class HogarTokenResponse(BaseModel):
+    """Short-lived household session token (send it as X-Hogar-Token)."""
+    token: str
+    hogar_id: int
+    rol: str
+    expires_at: datetime
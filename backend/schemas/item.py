@@ -41,6 +41,15 @@ class StockItem(BaseModel):
     # Configuración para que Pydantic pueda mapear desde objetos SQLAlchemy
     model_config = ConfigDict(from_attributes=True)
 
+class StockPage(BaseModel):
+    """Response: página del inventario (paginación por cursor).
+
+    next_cursor es opaco; se envía tal cual como `cursor` para pedir la siguiente
+    página. Es None en la última página.
+    """
+    items: list["StockItem"]
+    next_cursor: str | None = None
+
 class StockAlertItem(BaseModel):
     """Response: item de stock para alertas (puede evolucionar por separado)."""
     id_stock: int
@@ -72,4 +81,5 @@ class LocationSchema(BaseModel):
     id_ubicacion: int
 
 StockItem.model_rebuild()
+StockPage.model_rebuild()
 StockAlertItem.model_rebuild()
\ No newline at end of file
@@ -1,5 +1,5 @@
 # backend/schemas/notification.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 class DeviceRegisterRequest(BaseModel):
@@ -8,8 +8,8 @@ class DeviceRegisterRequest(BaseModel):
 
 class PreferenceUpdateRequest(BaseModel):
     notifications_enabled: bool
-    notification_time: str  # "HH:MM:SS"
-    timezone_offset: int  # Minutes
+    notification_time: str = Field(..., pattern=r"^([01]\d|2[0-3]):[0-5]\d:[0-5]\d$")  # "HH:MM:SS"
+    timezone_offset: int = Field(..., ge=-24 * 60, le=24 * 60)  # Minutes, JS convention (UTC = local + offset)
 
 class PreferenceResponse(BaseModel):
     user_id: str
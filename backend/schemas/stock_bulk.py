@@ -0,0 +1,55 @@
+# backend/schemas/stock_bulk.py
+from pydantic import BaseModel, Field
+from typing import Literal
+from .item import StockItemCreate, StockItem
+from .stock_update import StockRemove
+
+
+class StockBulkCreate(BaseModel):
+    """Request: alta de varios items de stock en una sola petición.
+
+    Cada entrada tiene la forma de StockItemCreate; las entradas de escaneo
+    (StockItemCreateFromScan) son válidas tal cual porque incluyen el barcode.
+    """
+    items: list[StockItemCreate] = Field(..., min_length=1, max_length=200)
+
+
+class StockBulkResult(BaseModel):
+    """Response: resultado de una entrada del alta masiva (mismo orden que la petición)."""
+    index: int
+    status: Literal['created', 'updated', 'error']
+    item: StockItem | None = None
+    error: str | None = None
+
+
+class StockBulkResponse(BaseModel):
+    """Response: resultados por entrada y totales del alta masiva."""
+    results: list[StockBulkResult]
+    created: int
+    updated: int
+    failed: int
+
+
+class StockRemoveBatch(BaseModel):
+    """Request: retirar (consumir) cantidades de varios items de stock en una sola petición.
+
+    Las entradas repetidas de un mismo id_stock se suman.
+    """
+    items: list[StockRemove] = Field(..., min_length=1, max_length=200)
+
+
+class StockRemoveResult(BaseModel):
+    """Response: resultado de una entrada de la retirada masiva (mismo orden que la petición)."""
+    index: int
+    id_stock: int
+    status: Literal['updated', 'deleted', 'error']
+    new_quantity: int | None = None
+    error: str | None = None
+
+
+class StockRemoveBatchResponse(BaseModel):
+    """Response: resultados por entrada y totales de la retirada masiva."""
+    results: list[StockRemoveResult]
+    updated: int
+    deleted: int
+    failed: int
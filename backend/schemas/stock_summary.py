@@ -0,0 +1,36 @@
+# backend/schemas/stock_summary.py
+from pydantic import BaseModel, Field
+
+
+class SummaryCount(BaseModel):
+    """Número de items (filas de stock) y de unidades (suma de cantidades)."""
+    items: int = 0
+    unidades: int = 0
+
+
+class SummaryByState(BaseModel):
+    cerrado: SummaryCount = Field(default_factory=SummaryCount)
+    abierto: SummaryCount = Field(default_factory=SummaryCount)
+    congelado: SummaryCount = Field(default_factory=SummaryCount)
+    descongelado: SummaryCount = Field(default_factory=SummaryCount)
+
+
+class SummaryByExpiry(BaseModel):
+    """Mismos tramos que el filtro 'status' del listado; excluye los congelados."""
+    caducado: SummaryCount = Field(default_factory=SummaryCount)
+    urgente: SummaryCount = Field(default_factory=SummaryCount)
+    por_caducar: SummaryCount = Field(default_factory=SummaryCount)
+
+
+class SummaryByLocation(SummaryCount):
+    id_ubicacion: int
+    nombre: str
+
+
+class StockSummary(BaseModel):
+    """Response: resumen del inventario del hogar para la pantalla de inicio."""
+    version: int
+    total: SummaryCount
+    por_estado: SummaryByState
+    por_caducidad: SummaryByExpiry
+    por_ubicacion: list[SummaryByLocation]
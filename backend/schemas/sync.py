@@ -0,0 +1,29 @@
+# backend/schemas/sync.py
+from pydantic import BaseModel, Field
+from .item import StockItem, ProductSchema
+from .location import Location
+from .shopping_list import ShoppingItemResponse
+
+
+class SyncDeleted(BaseModel):
+    """Response: IDs borrados desde la versión pedida (tombstones)."""
+    stock: list[int] = []
+    ubicaciones: list[int] = []
+    productos: list[int] = []
+    lista_compra: list[int] = []
+
+
+class SyncResponse(BaseModel):
+    """Response: cambios de un hogar desde una versión.
+
+    Las filas se devuelven en su estado actual. Si `reset` es True, el registro de
+    cambios no cubre la versión pedida: el cliente debe recargar todo y seguir
+    sincronizando desde `version`.
+    """
+    version: int = Field(..., description="Versión del hogar incluida en esta respuesta (usar como siguiente 'since')")
+    reset: bool = False
+    stock: list[StockItem] = []
+    ubicaciones: list[Location] = []
+    productos: list[ProductSchema] = []
+    lista_compra: list[ShoppingItemResponse] = []
+    eliminados: SyncDeleted = SyncDeleted()
@@ -4,10 +4,14 @@ from .location_service import LocationService
 from .stock_service import StockService
 from .alert_service import AlertService
 from .product_actions_service import ProductActionsService
+from .shopping_list_service import ShoppingListService
+from .sync_service import SyncService
 
 __all__ = [
     "LocationService",
     "StockService",
     "AlertService",
     "ProductActionsService",
+    "ShoppingListService",
+    "SyncService",
 ]
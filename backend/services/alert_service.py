@@ -1,13 +1,54 @@
 # backend/services/alert_service.py
+import os
+from datetime import date, datetime, timedelta
 from sqlalchemy.orm import Session
+from cache import TTLCache
+from change_tracking import on_hogar_changed
 from repositories.stock_repository import StockRepository
-from schemas.alert import AlertResponse
+from fast_json import dumps, stock_alert_dict
+
+# Serialized AlertResponse per (household, version, day, query). A request reads the current
+# version first, so an entry is never served after a write from any worker; writes made by this
+# worker also drop the household's entries right away, and entries expire at midnight.
+alert_cache = TTLCache(
+    maxsize=int(os.getenv("ALERT_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("ALERT_CACHE_TTL", "3600")),
+    name="alerts",
+)
+
+
+@on_hogar_changed
+def _invalidate_alerts(hogar_id: int):
+    alert_cache.invalidate(lambda key, _: key[0] == hogar_id)
+
+
+def _seconds_until_midnight() -> float:
+    now = datetime.now()
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+    return (midnight - now).total_seconds()
+
 
 class AlertService:
     def __init__(self, db: Session):
         self.repo = StockRepository(db)
 
-    def get_expiring_alerts_for_hogar(self, days: int, hogar_id: int) -> AlertResponse:
-        """Get expiring alerts for a household."""
-        items = self.repo.get_alertas_caducidad_for_hogar(days, hogar_id)
-        return AlertResponse(productos_proximos_a_caducar=items)
+    def get_expiring_alerts_for_hogar(self, days: int, hogar_id: int, limit: int | None = None, offset: int = 0) -> dict:
+        """
+        Get expiring alerts for a household, most urgent first (schemas.AlertResponse as a dict, see fast_json).
+        With `limit`, `hay_mas` tells whether more alerts follow.
+        """
+        # One extra row tells whether there are more
+        rows = self.repo.get_alertas_caducidad_for_hogar(days, hogar_id, None if limit is None else limit + 1, offset)
+        hay_mas = limit is not None and len(rows) > limit
+        if hay_mas:
+            rows = rows[:limit]
+        return {"productos_proximos_a_caducar": [stock_alert_dict(row) for row in rows], "hay_mas": hay_mas}
+
+    def get_expiring_alerts_json(self, days: int, hogar_id: int, version: int, limit: int | None = None, offset: int = 0) -> bytes:
+        """Encoded AlertResponse, from alert_cache while the household version and the day are unchanged."""
+        key = (hogar_id, version, date.today(), days, limit, offset)
+        body = alert_cache.get(key)
+        if body is None:
+            body = dumps(self.get_expiring_alerts_for_hogar(days, hogar_id, limit, offset))
+            alert_cache.set(key, body, ttl=min(alert_cache.ttl, _seconds_until_midnight()))
+        return body
@@ -5,6 +5,7 @@ from sqlalchemy.exc import IntegrityError
 from repositories.location_repository import LocationRepository
 from schemas import LocationCreate
 from models import Location
+from fast_json import location_dict
 
 class LocationService:
     def __init__(self, db: Session):
@@ -27,9 +28,9 @@ class LocationService:
         except Exception:
             raise HTTPException(status_code=500, detail="Ocurrió un error interno al crear la ubicación.")
 
-    def get_all_ubicaciones_for_hogar(self, hogar_id: int) -> list[Location]:
-        """Get all locations for a household."""
-        return self.repo.get_all_locations_for_hogar(hogar_id)
+    def get_all_ubicaciones_for_hogar(self, hogar_id: int) -> list[dict]:
+        """Get all locations for a household (schemas.Location dicts, see fast_json)."""
+        return [location_dict(row) for row in self.repo.get_all_locations_for_hogar(hogar_id)]
 
     def delete_ubicacion(self, id_ubicacion: int, hogar_id: int):
         """Delete a location from a household."""
@@ -1,16 +1,53 @@
 # backend/services/notification_service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
-from models import UserDevice, UserPreference, InventoryStock, Product, Location, HogarMiembro
+from sqlalchemy import and_, delete, func, select
+from database import SessionLocal
+from models import UserDevice, UserPreference, InventoryStock, Product, Location, HogarMiembro, NotificationOutbox
+from repositories.notification_outbox_repository import NotificationOutboxRepository
 from datetime import datetime, timedelta
 from firebase_admin import messaging
+from collections import Counter, defaultdict
+from push import send_messages
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+MINUTES_PER_DAY = 24 * 60
+# Dispositivos sin registrarse (last_active) en este tiempo se consideran abandonados
+FCM_TOKEN_STALE_DAYS = int(os.getenv("FCM_TOKEN_STALE_DAYS", "60"))
+_PRUNE_CHUNK = 1000
+# Outbox: filas por lote del drain, reintentos (backoff exponencial) y retención
+OUTBOX_BATCH_SIZE = int(os.getenv("OUTBOX_BATCH_SIZE", "500"))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv("OUTBOX_MAX_ATTEMPTS", "5"))
+OUTBOX_RETRY_BASE_SECONDS = 60
+OUTBOX_RETRY_MAX_SECONDS = 3600
+OUTBOX_RETENTION_DAYS = int(os.getenv("OUTBOX_RETENTION_DAYS", "14"))
+
+
+def utc_minute_of_day(notification_time, timezone_offset: int) -> int:
+    """
+    UTC minute of the day (0-1439) for a local 'HH:MM[:SS]' time.
+    The offset follows JS getTimezoneOffset(): UTC = local + offset (e.g. -60 for UTC+1).
+    """
+    hours, minutes = map(int, str(notification_time).split(':')[:2])
+    return (hours * 60 + minutes + (timezone_offset or 0)) % MINUTES_PER_DAY
+
+def expiry_message_body(first_names: list[str], count: int) -> str:
+    """Notification text for `count` expiring items, naming the first two."""
+    product_names = ", ".join(first_names)
+    if count > 2:
+        return f"{product_names} y {count - 2} más caducan pronto."
+    if count == 1:
+        return f"{product_names} caduca pronto."
+    return f"{product_names} caducan pronto."
+
+
 class NotificationService:
-    def __init__(self, db: Session):
+    def __init__(self, db: Session, transport=None):
         self.db = db
+        self.transport = transport  # push transport; None = FCM_TRANSPORT
+        self.outbox = NotificationOutboxRepository(db)
 
     def register_device(self, user_id: str, token: str, platform: str):
         """Register or update a user device for push notifications."""
@@ -26,17 +63,20 @@ class NotificationService:
 
     def update_preferences(self, user_id: str, enabled: bool, time_str: str, offset: int):
         """Update user notification preferences."""
+        utc_minute = utc_minute_of_day(time_str, offset)
         pref = self.db.query(UserPreference).filter_by(user_id=user_id).first()
         if pref:
             pref.notifications_enabled = enabled
             pref.notification_time = time_str
             pref.timezone_offset = offset
+            pref.notification_utc_minute = utc_minute
         else:
             pref = UserPreference(
                 user_id=user_id, 
                 notifications_enabled=enabled, 
                 notification_time=time_str, 
-                timezone_offset=offset
+                timezone_offset=offset,
+                notification_utc_minute=utc_minute
             )
             self.db.add(pref)
         self.db.commit()
@@ -51,113 +91,186 @@ class NotificationService:
             self.db.commit()
         return pref
 
+    def prune_devices(self, tokens) -> int:
+        """Delete every device registered with one of `tokens` (rejected by FCM). Does not commit."""
+        tokens = list(set(tokens))
+        deleted = 0
+        for i in range(0, len(tokens), _PRUNE_CHUNK):
+            deleted += self.db.execute(
+                delete(UserDevice).where(UserDevice.fcm_token.in_(tokens[i:i + _PRUNE_CHUNK]))
+            ).rowcount
+        return deleted
+
+    def prune_stale_devices(self, days: int = FCM_TOKEN_STALE_DAYS) -> int:
+        """Delete devices not registered again in `days` days (the app re-registers on start)."""
+        cutoff = datetime.utcnow() - timedelta(days=days)
+        deleted = self.db.execute(delete(UserDevice).where(UserDevice.last_active < cutoff)).rowcount
+        self.db.commit()
+        return deleted
+
     def trigger_daily_notifications(self):
         """
-        Check for expiring products and send notifications to users who scheduled them for this hour.
-        This method is intended to be called hourly by a cron job.
+        Enqueue today's expiry notification for the users who scheduled it for this hour.
+        This method is intended to be called hourly by a cron job; delivery happens in drain_outbox.
+
+        Set-based: a fixed number of queries however many users are due (due members, expiring
+        items of their households, users with devices), joined in memory. Users already
+        enqueued today are skipped, so running it twice does not send duplicates.
         """
         current_utc = datetime.utcnow()
-        current_hour = current_utc.hour
-        current_minute = current_utc.minute
+        today = current_utc.date()
+        target_date = today + timedelta(days=3)
         
-        # 1. Find users who want notifications at this UTC hour
-        # Logic: User Time (minutes) - Offset = UTC Time (minutes)
-        # We check if current UTC time matches User Preference Time +/- 30 mins window
+        # 1. Users due this UTC hour and their households
+        # notification_utc_minute ya está en UTC (ver utc_minute_of_day): un rango sobre el índice
+        # parcial devuelve solo los usuarios de esta hora, sin recorrer todas las preferencias
+        hour_start = current_utc.hour * 60
+        due_users = select(UserPreference.user_id).where(
+            UserPreference.notifications_enabled == True,  # noqa: E712
+            UserPreference.notification_utc_minute >= hour_start,
+            UserPreference.notification_utc_minute < hour_start + 60,
+        )
+        user_hogares = defaultdict(list)
+        for user_id, hogar_id in self.db.execute(
+            select(HogarMiembro.user_id, HogarMiembro.fk_hogar).where(HogarMiembro.user_id.in_(due_users))
+        ):
+            user_hogares[user_id].append(hogar_id)
+        if not user_hogares:
+            return {"status": "success", "due_users": 0, "enqueued": 0}
         
-        # Simplified approach: Check users whose (LocalTime - Offset) matches CurrentUTC +/- margin
-        # But storing time as string 'HH:MM:SS' makes SQL math hard.
-        # We will iterate all enabled users and check in Python for simplicity (assuming low user count for now)
-        # For scale, this should be optimized with SQL math.
-        
-        users_prefs = self.db.query(UserPreference).filter_by(notifications_enabled=True).all()
+        # 2. Products expiring in 3 days (or less, but not expired yet), once per household
+        # (no una vez por miembro) y con el nombre del producto en la misma consulta
+        due_hogares = select(HogarMiembro.fk_hogar).where(HogarMiembro.user_id.in_(due_users))
+        hogar_items = defaultdict(list)
+        for hogar_id, fecha, id_stock, nombre in self.db.execute(
+            select(InventoryStock.hogar_id, InventoryStock.fecha_caducidad, InventoryStock.id_stock, Product.nombre)
+            .join(Product, InventoryStock.fk_producto_maestro == Product.id_producto)
+            .where(
+                InventoryStock.hogar_id.in_(due_hogares),
+                InventoryStock.fecha_caducidad <= target_date,
+                InventoryStock.fecha_caducidad >= today,
+                InventoryStock.cantidad_actual > 0,
+            )
+        ):
+            hogar_items[hogar_id].append((fecha, id_stock, nombre))
         
-        sent_count = 0
+        # 3. Due users with at least one device
+        with_devices = set(self.db.scalars(
+            select(UserDevice.user_id).where(UserDevice.user_id.in_(due_users)).distinct()
+        ))
         
-        for pref in users_prefs:
-            try:
-                # Parse user preferred time
-                h, m, s = map(int, pref.notification_time.split(':'))
-                user_minutes = h * 60 + m
-                
-                # Calculate target UTC minutes for this user
-                # Offset is in minutes. If offset is -60 (UTC+1), then 09:00 Local (540m) -> 540 - (-60) = 600m ?? No.
-                # Timezone Offset usually means Local = UTC - Offset (or similar, depends on JS convention).
-                # JS: new Date().getTimezoneOffset() returns positive if behind UTC (e.g. UTC-5 is 300).
-                # Let's assume standard JS offset: UTC = Local + Offset (minutes).
-                # Example: UTC+1 (Spain). 09:00 Local. JS offset is -60.
-                # UTC = 09:00 + (-60min) = 08:00. Correct.
-                
-                target_utc_minutes = user_minutes + pref.timezone_offset
-                
-                # Normalize to 0-1440
-                target_utc_minutes = target_utc_minutes % 1440
-                
-                current_utc_minutes = current_hour * 60 + current_minute
-                
-                # Check if we are within the hour window (e.g. cron runs at :00, we match if target is within this hour)
-                # Actually, cron runs hourly. We should match if target hour == current hour.
-                target_utc_hour = target_utc_minutes // 60
-                
-                if target_utc_hour != current_hour:
-                    continue
-                
-                # 2. Check for expiring products for this user
-                # We need to find all households this user belongs to
-                hogar_ids = [m.fk_hogar for m in self.db.query(HogarMiembro).filter_by(user_id=pref.user_id).all()]
-                
-                if not hogar_ids:
-                    continue
-                
-                # Find products expiring in 3 days (or less, but not expired yet)
-                target_date = current_utc.date() + timedelta(days=3)
-                today = current_utc.date()
-                
-                expiring_items = self.db.query(InventoryStock).join(Product).filter(
-                    InventoryStock.hogar_id.in_(hogar_ids),
-                    InventoryStock.fecha_caducidad <= target_date,
-                    InventoryStock.fecha_caducidad >= today,
-                    InventoryStock.cantidad_actual > 0
-                ).all()
-                
-                if not expiring_items:
-                    continue
-                
-                # 3. Construct message
-                count = len(expiring_items)
-                product_names = ", ".join([item.producto_maestro.nombre for item in expiring_items[:2]])
-                if count > 2:
-                    body = f"{product_names} y {count - 2} más caducan pronto."
-                elif count == 1:
-                    body = f"{product_names} caduca pronto."
-                else:
-                    body = f"{product_names} caducan pronto."
-                
-                # 4. Send to all user devices
-                devices = self.db.query(UserDevice).filter_by(user_id=pref.user_id).all()
-                if not devices:
-                    continue
-                
-                for device in devices:
-                    try:
-                        message = messaging.Message(
-                            notification=messaging.Notification(
-                                title="⚠️ Caducidad Próxima",
-                                body=body,
-                            ),
-                            token=device.fcm_token,
-                            data={
-                                "click_action": "FLUTTER_NOTIFICATION_CLICK",
-                                "type": "expiry_alert"
-                            }
-                        )
-                        messaging.send(message)
-                        sent_count += 1
-                    except Exception as e:
-                        logger.error(f"Error sending FCM to {device.user_id}: {e}")
-                        # Optionally remove invalid token
-                        
-            except Exception as e:
-                logger.error(f"Error processing user {pref.user_id}: {e}")
+        # 4. One outbox row per user and day (in memory, then one INSERT ... ON CONFLICT DO NOTHING)
+        rows = []
+        for user_id, hogar_ids in user_hogares.items():
+            items = sorted(item for hogar_id in hogar_ids for item in hogar_items.get(hogar_id, ()))
+            if user_id not in with_devices or not items:
                 continue
-                
-        return {"status": "success", "notifications_sent": sent_count}
+            rows.append({
+                "user_id": user_id,
+                "fecha": today,
+                "tipo": "expiry_alert",
+                "title": "⚠️ Caducidad Próxima",
+                "body": expiry_message_body([nombre for _, _, nombre in items[:2]], len(items)),
+                "next_attempt_at": current_utc,
+                "created_at": current_utc,
+            })
+        enqueued = self.outbox.enqueue(rows) if rows else 0
+        self.db.commit()
+        return {"status": "success", "due_users": len(user_hogares), "enqueued": enqueued}
+
+    def drain_outbox(self, batch_size: int = OUTBOX_BATCH_SIZE, max_batches: int | None = None) -> dict:
+        """
+        Deliver pending outbox rows that are due, in batches, until none is left.
+
+        Each batch is claimed with FOR UPDATE SKIP LOCKED, sent to every device of its users
+        (push.send_messages), settled and committed in one transaction, so concurrent drains
+        share the work and a crash leaves the batch pending (delivery is at-least-once).
+        Transient failures are retried with exponential backoff up to OUTBOX_MAX_ATTEMPTS.
+        """
+        totals = Counter()
+        errors = Counter()
+        batches = 0
+        while max_batches is None or batches < max_batches:
+            now = datetime.utcnow()
+            rows = self.outbox.claim_due(now, batch_size)
+            if not rows:
+                break
+            batches += 1
+            
+            user_tokens = defaultdict(list)
+            for user_id, token in self.db.execute(
+                select(UserDevice.user_id, UserDevice.fcm_token)
+                .where(UserDevice.user_id.in_({row.user_id for row in rows}))
+            ):
+                user_tokens[user_id].append(token)
+            
+            messages, owners = [], []
+            for row in rows:
+                for token in user_tokens.get(row.user_id, ()):
+                    messages.append(messaging.Message(
+                        notification=messaging.Notification(title=row.title, body=row.body),
+                        token=token,
+                        data={
+                            "click_action": "FLUTTER_NOTIFICATION_CLICK",
+                            "type": row.tipo
+                        }
+                    ))
+                    owners.append(row.id)
+            
+            results = send_messages(messages, self.transport)
+            row_results = defaultdict(list)
+            for row_id, result in zip(owners, results):
+                row_results[row_id].append(result)
+                if not result.ok:
+                    errors[result.error] += 1
+            for row in rows:
+                totals[self._settle(row, row_results[row.id], now)] += 1
+            totals["messages_sent"] += sum(1 for r in results if r.ok)
+            
+            # Forget the devices whose token FCM rejected (UNREGISTERED, INVALID_ARGUMENT)
+            totals["devices_pruned"] += self.prune_devices(r.token for r in results if r.dead_token)
+            self.db.commit()
+        
+        if errors:
+            logger.error(f"FCM delivery failures: {dict(errors)}")
+        return {
+            "status": "success",
+            "batches": batches,
+            "sent": totals["sent"],
+            "retrying": totals["pending"],
+            "failed": totals["failed"],
+            "messages_sent": totals["messages_sent"],
+            "errors": dict(errors),
+            "devices_pruned": totals["devices_pruned"],
+        }
+
+    def prune_outbox(self, days: int = OUTBOX_RETENTION_DAYS) -> int:
+        """Delete delivered or failed outbox rows older than `days` days."""
+        deleted = self.outbox.prune(datetime.utcnow() - timedelta(days=days))
+        self.db.commit()
+        return deleted
+
+    def _settle(self, row: NotificationOutbox, results: list, now: datetime) -> str:
+        """Record the outcome of one delivery attempt on `row`. Returns its new status."""
+        row.attempts += 1
+        if any(r.ok for r in results):
+            row.status, row.sent_at, row.last_error = 'sent', now, None
+        elif all(r.dead_token for r in results):
+            # Sin dispositivos válidos: reintentar no sirve de nada
+            row.status, row.last_error = 'failed', results[0].error if results else 'NO_DEVICES'
+        elif row.attempts >= OUTBOX_MAX_ATTEMPTS:
+            row.status, row.last_error = 'failed', results[0].error
+        else:
+            row.last_error = next(r.error for r in results if not r.dead_token)
+            delay = min(OUTBOX_RETRY_BASE_SECONDS * 2 ** (row.attempts - 1), OUTBOX_RETRY_MAX_SECONDS)
+            row.next_attempt_at = now + timedelta(seconds=delay)
+        return row.status
+
+
+def drain_notification_outbox(transport=None) -> dict:
+    """Run NotificationService.drain_outbox with its own session (background tasks, scheduler)."""
+    db = SessionLocal()
+    try:
+        return NotificationService(db, transport).drain_outbox()
+    finally:
+        db.close()
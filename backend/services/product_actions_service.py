@@ -11,7 +11,6 @@ from datetime import date, timedelta
 from fastapi import HTTPException
 from repositories.stock_repository import StockRepository
 from repositories.location_repository import LocationRepository
-from models import InventoryStock
 
 
 class ProductActionsService:
@@ -92,8 +91,8 @@ class ProductActionsService:
             self.db.add(master_product)
             self.db.commit() # Ensure this change is saved
 
-        # Create new opened item
-        new_item = InventoryStock(
+        # Add opened units (merged into an existing opened group if there is one)
+        new_item = self.stock_repo.upsert_stock_item(
             hogar_id=hogar_id,
             fk_producto_maestro=master_product.id_producto,
             fk_ubicacion=target_location_id,
@@ -103,9 +102,7 @@ class ProductActionsService:
             fecha_apertura=today,
             dias_caducidad_abierto=dias_vida_util
         )
-        self.db.add(new_item)
         self.db.commit()
-        self.db.refresh(new_item)
         
         return {
             "message": f"Producto abierto exitosamente. {expiry_message}",
@@ -164,8 +161,8 @@ class ProductActionsService:
         else:
             self.db.commit()
         
-        # Create new frozen item
-        new_item = InventoryStock(
+        # Add frozen units (merged into an existing frozen group if there is one)
+        new_item = self.stock_repo.upsert_stock_item(
             hogar_id=hogar_id,
             fk_producto_maestro=original_item.fk_producto_maestro,
             fk_ubicacion=ubicacion_congelador_id,
@@ -174,9 +171,7 @@ class ProductActionsService:
             estado_producto='congelado',
             fecha_congelacion=today
         )
-        self.db.add(new_item)
         self.db.commit()
-        self.db.refresh(new_item)
         
         return {
             "message": "Producto congelado exitosamente",
@@ -246,8 +241,8 @@ class ProductActionsService:
         else:
             self.db.commit()
         
-        # Create new unfrozen item
-        new_item = InventoryStock(
+        # Add unfrozen units (merged into an existing unfrozen group if there is one)
+        new_item = self.stock_repo.upsert_stock_item(
             hogar_id=hogar_id,
             fk_producto_maestro=frozen_item.fk_producto_maestro,
             fk_ubicacion=nueva_ubicacion_id,
@@ -258,9 +253,7 @@ class ProductActionsService:
             fecha_descongelacion=today,
             dias_caducidad_abierto=dias_vida_util
         )
-        self.db.add(new_item)
         self.db.commit()
-        self.db.refresh(new_item)
         
         return {
             "message": "Producto descongelado exitosamente. ¡Consumir pronto!",
@@ -282,10 +275,8 @@ class ProductActionsService:
         Steps:
         1. Validate original item exists and has enough units
         2. Validate new location
-        3. Check if item with same characteristics exists in new location
-        4. If exists: merge quantities
-        5. If not: create new item
-        6. Decrement original item
+        3. Decrement original item
+        4. Upsert into the equivalent group in the new location (merges quantities if it exists)
         """
         # Get original item
         original_item = self.stock_repo.get_stock_item_by_id_and_hogar(stock_id, hogar_id)
@@ -311,15 +302,6 @@ class ProductActionsService:
         if not new_location:
             raise HTTPException(status_code=404, detail="Ubicación no encontrada")
         
-        # Check if equivalent item exists in target location
-        existing_item = self.db.query(InventoryStock).filter(
-            InventoryStock.hogar_id == hogar_id,
-            InventoryStock.fk_producto_maestro == original_item.fk_producto_maestro,
-            InventoryStock.fk_ubicacion == nueva_ubicacion_id,
-            InventoryStock.fecha_caducidad == original_item.fecha_caducidad,
-            InventoryStock.estado_producto == original_item.estado_producto
-        ).first()
-        
         # Update original item quantity
         original_item.cantidad_actual -= cantidad
         if original_item.cantidad_actual == 0:
@@ -327,31 +309,23 @@ class ProductActionsService:
         else:
             self.db.commit()
         
-        new_item_id = None
-        if existing_item:
-            # Merge into existing item
-            existing_item.cantidad_actual += cantidad
-            self.db.commit()
-            new_item_id = existing_item.id_stock
-            message = f"Producto movido y fusionado con item existente"
-        else:
-            # Create new item in target location
-            new_item = InventoryStock(
-                hogar_id=hogar_id,
-                fk_producto_maestro=original_item.fk_producto_maestro,
-                fk_ubicacion=nueva_ubicacion_id,
-                cantidad_actual=cantidad,
-                fecha_caducidad=original_item.fecha_caducidad,
-                estado_producto=original_item.estado_producto,
-                fecha_apertura=original_item.fecha_apertura,
-                fecha_congelacion=original_item.fecha_congelacion,
-                dias_caducidad_abierto=original_item.dias_caducidad_abierto
-            )
-            self.db.add(new_item)
-            self.db.commit()
-            self.db.refresh(new_item)
-            new_item_id = new_item.id_stock
-            message = "Producto reubicado exitosamente"
+        # Add units to the equivalent group in the target location (merged if it exists)
+        new_item = self.stock_repo.upsert_stock_item(
+            hogar_id=hogar_id,
+            fk_producto_maestro=original_item.fk_producto_maestro,
+            fk_ubicacion=nueva_ubicacion_id,
+            cantidad_actual=cantidad,
+            fecha_caducidad=original_item.fecha_caducidad,
+            estado_producto=original_item.estado_producto,
+            fecha_apertura=original_item.fecha_apertura,
+            fecha_congelacion=original_item.fecha_congelacion,
+            fecha_descongelacion=original_item.fecha_descongelacion,
+            dias_caducidad_abierto=original_item.dias_caducidad_abierto
+        )
+        merged = new_item.cantidad_actual > cantidad
+        new_item_id = new_item.id_stock
+        self.db.commit()
+        message = "Producto movido y fusionado con item existente" if merged else "Producto reubicado exitosamente"
         
         return {
             "message": message,
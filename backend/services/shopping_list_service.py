@@ -0,0 +1,143 @@
+# backend/services/shopping_list_service.py
+from fastapi import HTTPException
+from sqlalchemy.orm import Session
+from datetime import datetime
+import models
+from repositories.stock_repository import StockRepository
+from fast_json import shopping_item_dict
+from schemas.shopping_list import ShoppingItemCreate, ShoppingItemUpdate, ShoppingItemResponse
+
+# Columns of the list endpoint (fast_json.shopping_item_dict); the product is outer-joined
+SHOPPING_ROW_COLUMNS = (
+    models.ShoppingListItem.id,
+    models.ShoppingListItem.hogar_id,
+    models.ShoppingListItem.producto_nombre,
+    models.ShoppingListItem.cantidad,
+    models.ShoppingListItem.fk_producto,
+    models.ShoppingListItem.completado,
+    models.ShoppingListItem.added_by,
+    models.ShoppingListItem.created_at,
+    models.ShoppingListItem.updated_at,
+    models.Product.id_producto,
+    models.Product.nombre,
+    models.Product.marca,
+    models.Product.barcode,
+    models.Product.image_url,
+    models.Product.dias_consumo_abierto,
+)
+
+
+class ShoppingListService:
+    def __init__(self, db: Session):
+        self.db = db
+
+    def get_items(self, hogar_id: int) -> list[dict]:
+        """Obtener items de la lista de compra de un hogar (dicts de ShoppingItemResponse, ver fast_json)."""
+        rows = (
+            self.db.query(*SHOPPING_ROW_COLUMNS)
+            .outerjoin(models.ShoppingListItem.producto)
+            .filter(models.ShoppingListItem.hogar_id == hogar_id)
+            .order_by(models.ShoppingListItem.completado, models.ShoppingListItem.created_at.desc())
+            .all()
+        )
+        return [shopping_item_dict(row) for row in rows]
+
+    def add_item(self, hogar_id: int, item: ShoppingItemCreate, user_id: str) -> ShoppingItemResponse:
+        """Añadir item a la lista de compra."""
+        # Verificar si ya existe un item no completado con el mismo nombre para agrupar
+        existing_item = self.db.query(models.ShoppingListItem).filter(
+            models.ShoppingListItem.hogar_id == hogar_id,
+            models.ShoppingListItem.producto_nombre == item.producto_nombre,
+            models.ShoppingListItem.completado == False
+        ).first()
+
+        if existing_item:
+            existing_item.cantidad += item.cantidad
+            self.db.commit()
+            self.db.refresh(existing_item)
+            return ShoppingItemResponse.model_validate(existing_item)
+
+        new_item = models.ShoppingListItem(
+            hogar_id=hogar_id,
+            producto_nombre=item.producto_nombre,
+            fk_producto=item.fk_producto,
+            cantidad=item.cantidad,
+            added_by=user_id
+        )
+        self.db.add(new_item)
+        self.db.commit()
+        self.db.refresh(new_item)
+        return ShoppingItemResponse.model_validate(new_item)
+
+    def _get_item(self, item_id: int) -> models.ShoppingListItem:
+        item = self.db.query(models.ShoppingListItem).filter(models.ShoppingListItem.id == item_id).first()
+        if not item:
+            raise HTTPException(status_code=404, detail="Item not found")
+        return item
+
+    def update_item(self, item_id: int, update_data: ShoppingItemUpdate) -> ShoppingItemResponse:
+        """Actualizar estado o cantidad de un item."""
+        item = self._get_item(item_id)
+
+        for key, value in update_data.dict(exclude_unset=True).items():
+            setattr(item, key, value)
+
+        self.db.commit()
+        self.db.refresh(item)
+        return ShoppingItemResponse.model_validate(item)
+
+    def delete_item(self, item_id: int) -> dict:
+        """Eliminar un item de la lista."""
+        item = self._get_item(item_id)
+
+        self.db.delete(item)
+        self.db.commit()
+        return {"message": "Item deleted"}
+
+    def move_to_inventory(self, item_id: int, ubicacion_id: int, fecha_caducidad: str) -> dict:
+        """Mover un item comprado al inventario."""
+        item = self._get_item(item_id)
+
+        # Crear entrada en inventario
+        # Si no tiene fk_producto, necesitamos buscarlo o crearlo.
+        # Por simplificación, si no tiene fk_producto, fallamos o requerimos que se asocie primero.
+        # En esta v1, asumiremos que si no tiene fk_producto, buscamos por nombre exacto o creamos uno básico.
+
+        product_id = item.fk_producto
+        if not product_id:
+            # Buscar por nombre
+            existing_prod = self.db.query(models.Product).filter(
+                models.Product.hogar_id == item.hogar_id,
+                models.Product.nombre == item.producto_nombre
+            ).first()
+
+            if existing_prod:
+                product_id = existing_prod.id_producto
+            else:
+                # Crear producto maestro básico
+                new_prod = models.Product(
+                    nombre=item.producto_nombre,
+                    hogar_id=item.hogar_id
+                )
+                self.db.add(new_prod)
+                self.db.commit()
+                self.db.refresh(new_prod)
+                product_id = new_prod.id_producto
+
+        # Upsert: si ya hay stock igual (producto, ubicación, fecha, estado) se suma la cantidad
+        new_stock = StockRepository(self.db).upsert_stock_item(
+            hogar_id=item.hogar_id,
+            fk_producto_maestro=product_id,
+            fk_ubicacion=ubicacion_id,
+            cantidad_actual=item.cantidad,
+            fecha_caducidad=datetime.strptime(fecha_caducidad, "%Y-%m-%d").date(),
+            estado_producto='cerrado'
+        )
+        stock_id = new_stock.id_stock
+
+        # Eliminar de la lista de compra (o marcar como completado/archivado)
+        # Aquí decidimos eliminarlo para limpiar la lista
+        self.db.delete(item)
+
+        self.db.commit()
+        return {"message": "Moved to inventory", "stock_id": stock_id}
@@ -3,11 +3,34 @@ from fastapi import HTTPException
 from sqlalchemy.orm import Session
 from repositories.product_repository import ProductRepository
 from repositories.location_repository import LocationRepository
-from repositories.stock_repository import StockRepository
+from repositories.stock_repository import StockRepository, STOCK_GROUPING_KEY
 from schemas.item import StockItemCreate, StockItemCreateFromScan, StockItem
-from schemas.stock_update import StockUpdate
+from schemas.stock_update import StockUpdate, StockRemove
+from schemas.stock_bulk import StockBulkResult, StockBulkResponse, StockRemoveResult, StockRemoveBatchResponse
+from schemas.stock_summary import StockSummary
+from models import InventoryStock, Location, Product
+from fast_json import stock_item_dict
+from cache import TTLCache
 from typing import List
-from datetime import datetime
+from datetime import date, datetime
+import base64
+import binascii
+import json
+import os
+
+# Last summary per household, tagged with the household version and the day it was computed
+# for. The version is read from the database on every request, so a change made through any
+# worker makes the entry stale; the TTL only bounds memory.
+summary_cache = TTLCache(
+    maxsize=int(os.getenv("SUMMARY_CACHE_SIZE", "5000")),
+    ttl=float(os.getenv("SUMMARY_CACHE_TTL", "3600")),
+    name="stock_summary",
+)
+
+
+def _grouping_key(row: InventoryStock) -> tuple:
+    return tuple(getattr(row, column) for column in STOCK_GROUPING_KEY)
+
 
 class StockService:
     def __init__(self, db: Session):
@@ -51,39 +74,8 @@ class StockService:
         if not producto_maestro:
              raise HTTPException(status_code=500, detail="No se pudo crear o encontrar el producto maestro.")
 
-        # 3. Grouping logic: Check if this product already exists in this location
-        existing_stock_item = self.stock_repo.find_stock_item(
-            hogar_id=hogar_id,
-            producto_maestro_id=producto_maestro.id_producto,
-            ubicacion_id=ubicacion.id_ubicacion,
-            fecha_caducidad=item_data.fecha_caducidad
-        )
-
-        if existing_stock_item:
-            # If exists, add quantity and update
-            existing_stock_item.cantidad_actual += item_data.cantidad
-            new_stock_item = self.stock_repo.update_stock_item(existing_stock_item)
-        else:
-            # If not exists, create new entry
-            estado_producto = 'cerrado'
-            fecha_congelacion = None
-            
-            if ubicacion.es_congelador:
-                estado_producto = 'congelado'
-                fecha_congelacion = datetime.utcnow().date()
-
-            new_stock_item = self.stock_repo.create_stock_item(
-                hogar_id=hogar_id,
-                fk_producto_maestro=producto_maestro.id_producto,
-                fk_ubicacion=ubicacion.id_ubicacion,
-                cantidad_actual=item_data.cantidad,
-                fecha_caducidad=item_data.fecha_caducidad,
-                estado_producto=estado_producto,
-                fecha_congelacion=fecha_congelacion
-            )
-        
-        # Return complete response object
-        return StockItem.from_orm(new_stock_item)
+        # 3. Grouping logic: atomic upsert into (product, location, date, state)
+        return self._add_to_stock(producto_maestro, ubicacion, item_data, hogar_id)
 
     def process_scan_stock(self, item_data: StockItemCreateFromScan, hogar_id: int, user_id: str) -> StockItem:
         """Process scanned barcode stock item for a household."""
@@ -101,68 +93,249 @@ class StockService:
             image_url=item_data.image_url
         )
 
-        # 3. Grouping logic: Check if this product already exists in this location
-        existing_stock_item = self.stock_repo.find_stock_item(
+        # 3. Grouping logic: atomic upsert into (product, location, date, state)
+        return self._add_to_stock(producto_maestro, ubicacion, item_data, hogar_id)
+
+    def _add_to_stock(self, producto_maestro: Product, ubicacion: Location, item_data: StockItemCreate | StockItemCreateFromScan, hogar_id: int) -> StockItem:
+        """Add units with a single upsert on the grouping key (race-free), then commit."""
+        estado_producto = 'cerrado'
+        fecha_congelacion = None
+
+        if ubicacion.es_congelador:
+            estado_producto = 'congelado'
+            fecha_congelacion = datetime.utcnow().date()
+
+        stock_item = self.stock_repo.upsert_stock_item(
             hogar_id=hogar_id,
-            producto_maestro_id=producto_maestro.id_producto,
-            ubicacion_id=ubicacion.id_ubicacion,
-            fecha_caducidad=item_data.fecha_caducidad
+            fk_producto_maestro=producto_maestro.id_producto,
+            fk_ubicacion=ubicacion.id_ubicacion,
+            cantidad_actual=item_data.cantidad,
+            fecha_caducidad=item_data.fecha_caducidad,
+            estado_producto=estado_producto,
+            fecha_congelacion=fecha_congelacion
         )
+        # Build the response before commit expires the row
+        response = StockItem.model_validate(stock_item)
+        self.db.commit()
+        return response
 
-        if existing_stock_item:
-            # If exists, add quantity and update
-            existing_stock_item.cantidad_actual += item_data.cantidad
-            new_stock_item = self.stock_repo.update_stock_item(existing_stock_item)
-        else:
-            # If not exists, create new entry
-            estado_producto = 'cerrado'
-            fecha_congelacion = None
-            
-            if ubicacion.es_congelador:
-                estado_producto = 'congelado'
-                fecha_congelacion = datetime.utcnow().date()
-
-            new_stock_item = self.stock_repo.create_stock_item(
-                hogar_id=hogar_id,
-                fk_producto_maestro=producto_maestro.id_producto,
-                fk_ubicacion=ubicacion.id_ubicacion,
-                cantidad_actual=item_data.cantidad,
-                fecha_caducidad=item_data.fecha_caducidad,
-                estado_producto=estado_producto,
-                fecha_congelacion=fecha_congelacion
+    def process_bulk_stock(self, items: List[StockItemCreate], hogar_id: int, user_id: str) -> StockBulkResponse:
+        """
+        Add many stock entries (manual or scanned) in a single transaction.
+
+        Locations and products are resolved with set-based queries; entries
+        are aggregated in memory by grouping key and written with a single
+        upsert, so entries with the same product, location, expiration date
+        and state (within the batch or against existing stock) are merged.
+        Entries that fail validation are reported and skipped; the rest are
+        committed together.
+        """
+        # 1. Locations (must belong to the household)
+        ubicaciones = {
+            loc.id_ubicacion: loc
+            for loc in self.location_repo.get_locations_by_ids_and_hogar({i.ubicacion_id for i in items}, hogar_id)
+        }
+
+        # 2. Products: explicit IDs, then barcodes, then names (same precedence as process_manual_stock)
+        requested_ids = {i.product_id for i in items if i.product_id}
+        by_id = {
+            p.id_producto: p
+            for p in (self.product_repo.get_by_ids_and_hogar(requested_ids, hogar_id) if requested_ids else [])
+        }
+        pending = [
+            i for i in items
+            if i.ubicacion_id in ubicaciones and not (i.product_id and i.product_id in by_id)
+        ]
+        barcodes = {i.barcode for i in pending if i.barcode}
+        names = {i.product_name.lower() for i in pending if not i.barcode}
+        by_barcode = {
+            p.barcode: p
+            for p in (self.product_repo.get_by_barcodes_and_hogar(barcodes, hogar_id) if barcodes else [])
+        }
+        by_name: dict[str, Product] = {}
+        for p in (self.product_repo.get_by_names_without_barcode(names, hogar_id) if names else []):
+            by_name.setdefault(p.nombre.lower(), p)
+
+        productos: list[Product | None] = []
+        for entry in items:
+            if entry.ubicacion_id not in ubicaciones:
+                productos.append(None)
+                continue
+            if entry.product_id and entry.product_id in by_id:
+                producto = by_id[entry.product_id]
+            elif entry.barcode:
+                producto = by_barcode.get(entry.barcode)
+                if producto is None:
+                    producto = Product(
+                        barcode=entry.barcode, nombre=entry.product_name, marca=entry.brand,
+                        hogar_id=hogar_id, image_url=entry.image_url
+                    )
+                    by_barcode[entry.barcode] = producto
+                    self.db.add(producto)
+            else:
+                producto = by_name.get(entry.product_name.lower())
+                if producto is None:
+                    producto = Product(nombre=entry.product_name, marca=entry.brand, hogar_id=hogar_id)
+                    by_name[entry.product_name.lower()] = producto
+                    self.db.add(producto)
+                elif entry.brand and not producto.marca:
+                    producto.marca = entry.brand
+            productos.append(producto)
+        self.db.flush()  # assigns IDs to new products
+
+        # 3. Aggregate entries per grouping key (the state comes from the location)
+        today = datetime.utcnow().date()
+        groups: dict[tuple, dict] = {}
+        entry_keys: list[tuple | None] = []
+        for entry, producto in zip(items, productos):
+            if producto is None:
+                entry_keys.append(None)
+                continue
+            ubicacion = ubicaciones[entry.ubicacion_id]
+            estado_producto = 'congelado' if ubicacion.es_congelador else 'cerrado'
+            key = (hogar_id, producto.id_producto, ubicacion.id_ubicacion, entry.fecha_caducidad, estado_producto)
+            entry_keys.append(key)
+            if key in groups:
+                groups[key]['cantidad_actual'] += entry.cantidad
+            else:
+                groups[key] = dict(
+                    zip(STOCK_GROUPING_KEY, key),
+                    cantidad_actual=entry.cantidad,
+                    fecha_congelacion=today if ubicacion.es_congelador else None
+                )
+
+        # 4. Which groups already exist (only used to report created vs updated)
+        existing: set[tuple] = set()
+        if groups:
+            existing = {
+                _grouping_key(row)
+                for row in self.stock_repo.find_stock_items(
+                    hogar_id,
+                    {k[1] for k in groups}, {k[2] for k in groups}, {k[3] for k in groups}
+                )
+            }
+
+        # 5. One upsert for every group; build responses before commit expires the rows
+        rows = {_grouping_key(row): row for row in self.stock_repo.upsert_stock_items(list(groups.values()))} if groups else {}
+        results = []
+        for index, key in enumerate(entry_keys):
+            if key is None:
+                results.append(StockBulkResult(
+                    index=index, status='error', error="Ubicación no encontrada o no pertenece a este hogar."
+                ))
+                continue
+            results.append(StockBulkResult(
+                index=index,
+                status='updated' if key in existing else 'created',
+                item=StockItem.model_validate(rows[key])
+            ))
+            existing.add(key)  # later entries of the same group merge into it
+        self.db.commit()
+
+        return StockBulkResponse(
+            results=results,
+            created=sum(1 for r in results if r.status == 'created'),
+            updated=sum(1 for r in results if r.status == 'updated'),
+            failed=sum(1 for r in results if r.status == 'error')
+        )
+
+    def get_stock_for_hogar(self, hogar_id: int, search: str | None, status_filter: List[str] | None = None, sort_by: str | None = None) -> List[dict]:
+        """Get all stock items for a household (StockItem dicts, see fast_json)."""
+        rows = self.stock_repo.get_all_stock_for_hogar(hogar_id, search, status_filter, sort_by)
+        return [stock_item_dict(row) for row in rows]
+
+    def get_stock_summary(self, hogar_id: int, version: int) -> StockSummary:
+        """
+        Counts by state, expiry bucket and location, from one grouped query.
+        Cached per (household version, day): the buckets depend on today's date.
+        """
+        today = date.today()
+        cached = summary_cache.get(hogar_id)
+        if cached is not None and cached[0] == (version, today):
+            return cached[1]
+
+        total = {"items": 0, "unidades": 0}
+        por_estado: dict[str, dict] = {}
+        por_caducidad: dict[str, dict] = {}
+        por_ubicacion: dict[int, dict] = {}
+        for row in self.stock_repo.get_stock_summary_rows(hogar_id, today):
+            location = por_ubicacion.setdefault(
+                row.id_ubicacion,
+                {"id_ubicacion": row.id_ubicacion, "nombre": row.nombre, "items": 0, "unidades": 0},
             )
-        
-        # Return complete response object
-        return StockItem.from_orm(new_stock_item)
+            if not row.items:
+                continue  # location without stock
+            counts = [total, location, por_estado.setdefault(row.estado_producto, {"items": 0, "unidades": 0})]
+            if row.bucket is not None:
+                counts.append(por_caducidad.setdefault(row.bucket, {"items": 0, "unidades": 0}))
+            for count in counts:
+                count["items"] += row.items
+                count["unidades"] += row.unidades
 
-    def get_stock_for_hogar(self, hogar_id: int, search: str | None, status_filter: List[str] | None = None, sort_by: str | None = None) -> List[StockItem]:
-        """Get all stock items for a household."""
-        stock_items = self.stock_repo.get_all_stock_for_hogar(hogar_id, search, status_filter, sort_by)
-        return [StockItem.from_orm(item) for item in stock_items]
+        summary = StockSummary(
+            version=version,
+            total=total,
+            por_estado=por_estado,
+            por_caducidad=por_caducidad,
+            por_ubicacion=list(por_ubicacion.values()),
+        )
+        summary_cache.set(hogar_id, ((version, today), summary))
+        return summary
 
-    def consume_stock_item(self, id_stock: int, hogar_id: int) -> dict:
-        """Consume one unit of a stock item."""
-        # 1. Find item and validate it belongs to household
-        item_to_consume = self.stock_repo.get_stock_item_by_id_and_hogar(id_stock, hogar_id)
+    def get_stock_page(
+        self,
+        hogar_id: int,
+        search: str | None,
+        status_filter: List[str] | None = None,
+        sort_by: str | None = None,
+        limit: int = 50,
+        cursor: str | None = None
+    ) -> dict:
+        """Get one keyset page of the household stock and the cursor of the next one (StockPage as a dict)."""
+        after = self._decode_cursor(cursor, sort_by) if cursor else None
+        # One extra row tells whether there is a next page
+        rows = self.stock_repo.get_stock_page(hogar_id, search, status_filter, sort_by, limit + 1, after)
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = self._encode_cursor(StockRepository.stock_sort_key(rows[-1], sort_by), sort_by)
+        return {"items": [stock_item_dict(row) for row in rows], "next_cursor": next_cursor}
 
-        if not item_to_consume:
-            raise HTTPException(status_code=404, detail="Producto no encontrado en el inventario.")
+    @staticmethod
+    def _encode_cursor(key: tuple, sort_by: str | None) -> str:
+        values = [v.isoformat() if isinstance(v, date) else v for v in key]
+        raw = json.dumps({"s": sort_by or "", "k": values}, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).rstrip(b"=").decode("ascii")
 
-        # 2. Reduce quantity
-        item_to_consume.cantidad_actual -= 1
+    @staticmethod
+    def _decode_cursor(cursor: str, sort_by: str | None) -> tuple:
+        columns = StockRepository.sort_columns(sort_by)
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+            if data["s"] != (sort_by or "") or len(data["k"]) != len(columns):
+                raise ValueError("cursor de otra ordenación")
+            return tuple(
+                date.fromisoformat(v) if column.type.python_type is date else column.type.python_type(v)
+                for column, v in zip(columns, data["k"])
+            )
+        except (ValueError, KeyError, TypeError, binascii.Error):
+            raise HTTPException(status_code=400, detail="Cursor de paginación inválido.")
 
-        # 3. Check if quantity is zero to delete it
-        if item_to_consume.cantidad_actual <= 0:
-            self.stock_repo.delete_stock_item(item_to_consume)
+    def consume_stock_item(self, id_stock: int, hogar_id: int) -> dict:
+        """Consume one unit of a stock item (one conditional UPDATE, plus a DELETE at zero)."""
+        new_quantity = self.stock_repo.subtract_stock_quantity(id_stock, hogar_id, 1)
+        if new_quantity is None:
+            # Only a missing item can fail here: stored quantities are always >= 1
+            raise HTTPException(status_code=404, detail="Producto no encontrado en el inventario.")
+        self.db.commit()
+
+        if new_quantity <= 0:
             return {"status": "deleted", "message": "Producto consumido y eliminado del inventario."}
-        else:
-            # If units remain, update database
-            self.stock_repo.update_stock_item(item_to_consume)
-            return {
-                "status": "updated",
-                "message": "Cantidad reducida en 1.",
-                "new_quantity": item_to_consume.cantidad_actual
-            }
+        return {
+            "status": "updated",
+            "message": "Cantidad reducida en 1.",
+            "new_quantity": new_quantity
+        }
 
     def remove_stock_quantity(self, id_stock: int, cantidad: int, hogar_id: int) -> dict:
         """Remove specific quantity from stock item."""
@@ -170,24 +343,61 @@ class StockService:
         if cantidad <= 0:
             raise HTTPException(status_code=400, detail="La cantidad a eliminar debe ser mayor que cero.")
 
-        # 2. Find item and validate it belongs to household
-        item_to_remove_from = self.stock_repo.get_stock_item_by_id_and_hogar(id_stock, hogar_id)
+        # 2. Reduce quantity only if there is enough stock (deletes the item at zero)
+        new_quantity = self.stock_repo.subtract_stock_quantity(id_stock, hogar_id, cantidad)
+        if new_quantity is None:
+            # Nothing changed: tell a missing item from insufficient stock
+            current = self.stock_repo.get_stock_quantity(id_stock, hogar_id)
+            if current is None:
+                raise HTTPException(status_code=404, detail="Producto no encontrado en el inventario.")
+            raise HTTPException(status_code=409, detail=f"No hay suficiente stock. Cantidad actual: {current}, intentas eliminar: {cantidad}.")
+        self.db.commit()
 
-        if not item_to_remove_from:
-            raise HTTPException(status_code=404, detail="Producto no encontrado en el inventario.")
+        if new_quantity <= 0:
+            return {"status": "deleted", "message": f"Se eliminaron {cantidad} unidades. El producto ha sido retirado del inventario."}
+        return {"status": "updated", "message": f"Se eliminaron {cantidad} unidades.", "new_quantity": new_quantity}
 
-        # 3. Validate sufficient stock
-        if item_to_remove_from.cantidad_actual < cantidad:
-            raise HTTPException(status_code=409, detail=f"No hay suficiente stock. Cantidad actual: {item_to_remove_from.cantidad_actual}, intentas eliminar: {cantidad}.")
+    def remove_stock_batch(self, items: List[StockRemove], hogar_id: int) -> StockRemoveBatchResponse:
+        """
+        Remove quantities from many stock items in one transaction.
 
-        # 4. Reduce quantity or delete item
-        item_to_remove_from.cantidad_actual -= cantidad
-        if item_to_remove_from.cantidad_actual <= 0:
-            self.stock_repo.delete_stock_item(item_to_remove_from)
-            return {"status": "deleted", "message": f"Se eliminaron {cantidad} unidades. El producto ha sido retirado del inventario."}
-        else:
-            self.stock_repo.update_stock_item(item_to_remove_from)
-            return {"status": "updated", "message": f"Se eliminaron {cantidad} unidades.", "new_quantity": item_to_remove_from.cantidad_actual}
+        Repeated IDs are summed and applied once. All entries are applied with one
+        conditional UPDATE and one DELETE for the items that reach zero; entries for
+        missing items or with too little stock are reported and change nothing.
+        """
+        amounts: dict[int, int] = {}
+        for entry in items:
+            if entry.cantidad > 0:
+                amounts[entry.id_stock] = amounts.get(entry.id_stock, 0) + entry.cantidad
+
+        new_quantities = self.stock_repo.subtract_stock_quantities(hogar_id, amounts)
+        failed_ids = amounts.keys() - new_quantities.keys()
+        current = self.stock_repo.get_stock_quantities(failed_ids, hogar_id) if failed_ids else {}
+        self.db.commit()
+
+        results = []
+        for index, entry in enumerate(items):
+            result = StockRemoveResult(index=index, id_stock=entry.id_stock, status='error')
+            if entry.cantidad <= 0:
+                result.error = "La cantidad a eliminar debe ser mayor que cero."
+            elif entry.id_stock in new_quantities:
+                result.new_quantity = new_quantities[entry.id_stock]
+                result.status = 'deleted' if result.new_quantity <= 0 else 'updated'
+            elif entry.id_stock in current:
+                result.error = (
+                    f"No hay suficiente stock. Cantidad actual: {current[entry.id_stock]}, "
+                    f"intentas eliminar: {amounts[entry.id_stock]}."
+                )
+            else:
+                result.error = "Producto no encontrado en el inventario."
+            results.append(result)
+
+        return StockRemoveBatchResponse(
+            results=results,
+            updated=sum(1 for r in results if r.status == 'updated'),
+            deleted=sum(1 for r in results if r.status == 'deleted'),
+            failed=sum(1 for r in results if r.status == 'error'),
+        )
 
     def update_stock_item_details(self, id_stock: int, hogar_id: int, payload: StockUpdate) -> StockItem:
         """Update editable fields of a stock item and optionally the associated master product."""
@@ -223,8 +433,22 @@ class StockService:
                 raise HTTPException(status_code=404, detail="Nueva ubicación no válida para este hogar.")
             item.fk_ubicacion = nueva_ubicacion.id_ubicacion
 
+        # If the new date/location lands on an existing group, merge into it
+        if payload.fecha_caducidad is not None or payload.ubicacion_id is not None:
+            duplicate = self.stock_repo.find_stock_item(
+                hogar_id=hogar_id,
+                producto_maestro_id=item.fk_producto_maestro,
+                ubicacion_id=item.fk_ubicacion,
+                fecha_caducidad=item.fecha_caducidad,
+                estado_producto=item.estado_producto
+            )
+            if duplicate is not None and duplicate is not item:
+                duplicate.cantidad_actual += item.cantidad_actual
+                self.db.delete(item)
+                item = duplicate
+
         # Persist changes (master product and stock item)
         self.db.commit()
         self.db.refresh(item)
         self.db.refresh(producto_maestro)
-        return StockItem.from_orm(item)
\ No newline at end of file
+        return StockItem.model_validate(item)
\ No newline at end of file
@@ -0,0 +1,100 @@
+# backend/services/sync_service.py
+import os
+from sqlalchemy.orm import Session, joinedload
+
+import models
+from repositories.change_log_repository import ChangeLogRepository
+from repositories.hogar_repository import HogarRepository
+from repositories.location_repository import LocationRepository
+from repositories.product_repository import ProductRepository
+from repositories.stock_repository import StockRepository
+from schemas.item import StockItem, ProductSchema
+from schemas.location import Location
+from schemas.shopping_list import ShoppingItemResponse
+from schemas.sync import SyncDeleted, SyncResponse
+
+# Beyond this many log rows a full reload is cheaper than a delta
+SYNC_MAX_CHANGES = int(os.getenv("SYNC_MAX_CHANGES", "2000"))
+
+
+class SyncService:
+    def __init__(self, db: Session):
+        self.db = db
+        self.log_repo = ChangeLogRepository(db)
+        self.hogar_repo = HogarRepository(db)
+        self.stock_repo = StockRepository(db)
+        self.location_repo = LocationRepository(db)
+        self.product_repo = ProductRepository(db)
+
+    def get_changes_since(self, hogar_id: int, since: int) -> SyncResponse:
+        """
+        Rows of the household changed after version `since`, in their current state,
+        plus the IDs deleted since then. Cost is proportional to the number of changes.
+        """
+        # Read the version first: everything logged up to it is already committed
+        version = self.hogar_repo.get_version(hogar_id) or 0
+        if since == version:
+            return SyncResponse(version=version)
+
+        oldest = self.log_repo.get_oldest_version(hogar_id)
+        if since > version or oldest is None or oldest > since + 1:
+            # Unknown version or the log no longer covers it
+            return SyncResponse(version=version, reset=True)
+
+        changes = self.log_repo.get_changes(hogar_id, since, version, SYNC_MAX_CHANGES + 1)
+        if len(changes) > SYNC_MAX_CHANGES:
+            return SyncResponse(version=version, reset=True)
+
+        # Latest operation per entity
+        latest: dict[tuple[str, int], str] = {}
+        for change in changes:
+            latest[(change.entidad, change.entidad_id)] = change.operacion
+        upserts: dict[str, set[int]] = {}
+        deleted = SyncDeleted()
+        tombstones = {
+            'stock': deleted.stock,
+            'ubicacion': deleted.ubicaciones,
+            'producto': deleted.productos,
+            'lista_compra': deleted.lista_compra,
+        }
+        for (entidad, entidad_id), operacion in latest.items():
+            if operacion == 'delete':
+                tombstones[entidad].append(entidad_id)
+            else:
+                upserts.setdefault(entidad, set()).add(entidad_id)
+
+        stock = self._load(upserts.get('stock'), self.stock_repo.get_stock_items_by_ids, hogar_id)
+        ubicaciones = self._load(upserts.get('ubicacion'), self.location_repo.get_locations_by_ids_and_hogar, hogar_id)
+        productos = self._load(upserts.get('producto'), self.product_repo.get_by_ids_and_hogar, hogar_id)
+        lista = self._load(upserts.get('lista_compra'), self._get_shopping_items, hogar_id)
+
+        # Rows changed and then removed by a later (not yet synced) transaction
+        for entidad, rows, id_attr in (
+            ('stock', stock, 'id_stock'),
+            ('ubicacion', ubicaciones, 'id_ubicacion'),
+            ('producto', productos, 'id_producto'),
+            ('lista_compra', lista, 'id'),
+        ):
+            missing = upserts.get(entidad, set()) - {getattr(row, id_attr) for row in rows}
+            tombstones[entidad].extend(sorted(missing))
+
+        return SyncResponse(
+            version=version,
+            stock=[StockItem.model_validate(item) for item in stock],
+            ubicaciones=[Location.model_validate(loc) for loc in ubicaciones],
+            productos=[ProductSchema.model_validate(p) for p in productos],
+            lista_compra=[ShoppingItemResponse.model_validate(item) for item in lista],
+            eliminados=deleted,
+        )
+
+    @staticmethod
+    def _load(ids: set[int] | None, loader, hogar_id: int) -> list:
+        return loader(ids, hogar_id) if ids else []
+
+    def _get_shopping_items(self, ids: set[int], hogar_id: int) -> list[models.ShoppingListItem]:
+        return (
+            self.db.query(models.ShoppingListItem)
+            .options(joinedload(models.ShoppingListItem.producto))
+            .filter(models.ShoppingListItem.id.in_(ids), models.ShoppingListItem.hogar_id == hogar_id)
+            .all()
+        )
@@ -0,0 +1,16 @@
+-- database/migrations/2026-10-17_add_hogar_cambios.sql
+
+-- Registro de cambios por hogar para la sincronización incremental
+-- (GET /inventory/sync?since=N). Cada commit que incrementa hogares.version
+-- añade una fila por entidad modificada, con esa misma versión.
+CREATE TABLE IF NOT EXISTS hogar_cambios (
+    id BIGSERIAL PRIMARY KEY,
+    hogar_id INTEGER NOT NULL REFERENCES hogares(id_hogar) ON DELETE CASCADE,
+    version INTEGER NOT NULL,
+    entidad VARCHAR(20) NOT NULL,      -- stock | ubicacion | producto | lista_compra
+    entidad_id INTEGER NOT NULL,
+    operacion VARCHAR(10) NOT NULL,    -- upsert | delete
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS ix_hogar_cambios_hogar_version ON hogar_cambios (hogar_id, version);
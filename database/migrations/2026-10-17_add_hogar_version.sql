@@ -0,0 +1,6 @@
+-- database/migrations/2026-10-17_add_hogar_version.sql
+
+-- Contador de cambios por hogar. El backend lo incrementa en cada commit que
+-- modifica stock, ubicaciones, productos o la lista de la compra, y lo usa
+-- para las cabeceras ETag / If-None-Match de los endpoints de lectura.
+ALTER TABLE hogares ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,5 @@
+-- database/migrations/2026-10-17_add_miembro_token_version.sql
+
+-- Versión de los tokens de hogar (X-Hogar-Token) de cada miembro.
+-- Se incrementa al cambiar el rol, lo que invalida los tokens emitidos antes.
+ALTER TABLE hogares_miembros ADD COLUMN IF NOT EXISTS token_version INTEGER NOT NULL DEFAULT 0;
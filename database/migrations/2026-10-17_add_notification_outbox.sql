@@ -0,0 +1,25 @@
+-- database/migrations/2026-10-17_add_notification_outbox.sql
+
+-- Cola de notificaciones push. El cron horario inserta como mucho una fila por
+-- usuario y día (si se reintenta o se ejecuta dos veces no hay duplicados) y
+-- el envío la vacía aparte con FOR UPDATE SKIP LOCKED, reintentando los fallos
+-- transitorios con backoff.
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    user_id VARCHAR(255) NOT NULL,
+    fecha DATE NOT NULL,                                  -- día UTC de la notificación
+    tipo VARCHAR(30) NOT NULL DEFAULT 'expiry_alert',
+    title VARCHAR(200) NOT NULL,
+    body TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',         -- pending | sent | failed
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    last_error VARCHAR(200),
+    created_at TIMESTAMP NOT NULL DEFAULT (NOW() AT TIME ZONE 'utc'),
+    sent_at TIMESTAMP,
+    CONSTRAINT notification_outbox_user_fecha_unique UNIQUE (user_id, fecha)
+);
+
+CREATE INDEX IF NOT EXISTS ix_notification_outbox_pending
+    ON notification_outbox (next_attempt_at)
+    WHERE status = 'pending';
@@ -0,0 +1,23 @@
+-- database/migrations/2026-10-17_add_notification_utc_minute.sql
+
+-- Hora de notificación de cada usuario ya convertida a minutos UTC del día
+-- (0-1439). El cron horario selecciona con un rango sobre este índice solo los
+-- usuarios de la hora actual, en lugar de cargar todas las preferencias.
+-- Convención del offset (JS getTimezoneOffset): UTC = hora local + offset.
+ALTER TABLE user_preferences
+    ADD COLUMN IF NOT EXISTS notification_utc_minute INTEGER NOT NULL DEFAULT 540;
+
+-- Backfill desde notification_time / timezone_offset (doble módulo: % conserva el signo en Postgres)
+UPDATE user_preferences
+SET notification_utc_minute = (
+    (
+        EXTRACT(HOUR FROM notification_time::time)::int * 60
+        + EXTRACT(MINUTE FROM notification_time::time)::int
+        + COALESCE(timezone_offset, 0)
+    ) % 1440 + 1440
+) % 1440
+WHERE notification_time IS NOT NULL;
+
+CREATE INDEX IF NOT EXISTS ix_user_preferences_utc_minute
+    ON user_preferences (notification_utc_minute)
+    WHERE notifications_enabled = TRUE;
@@ -0,0 +1,8 @@
+-- database/migrations/2026-10-17_add_stock_alertas_index.sql
+
+-- Índice parcial para las alertas de caducidad: productos no congelados de un
+-- hogar en orden de fecha de caducidad. Las alertas se ordenan en SQL y el
+-- widget pide solo las N primeras (LIMIT), que se leen directamente del índice.
+CREATE INDEX IF NOT EXISTS ix_stock_alertas
+    ON inventario_stock (hogar_id, fecha_caducidad)
+    WHERE estado_producto <> 'congelado';
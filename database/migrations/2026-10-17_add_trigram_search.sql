@@ -0,0 +1,11 @@
+-- database/migrations/2026-10-17_add_trigram_search.sql
+
+-- Búsqueda por subcadena indexada: pg_trgm + índices GIN.
+-- Sirven a ILIKE '%texto%' (búsqueda del inventario) y al operador % / similarity()
+-- (autocompletado de productos), que sin ellos recorren todo el catálogo.
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS ix_producto_nombre_trgm  ON producto_maestro USING gin (nombre gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_producto_marca_trgm   ON producto_maestro USING gin (marca gin_trgm_ops);
+CREATE INDEX IF NOT EXISTS ix_producto_barcode_trgm ON producto_maestro USING gin (barcode gin_trgm_ops);
@@ -0,0 +1,35 @@
+-- database/migrations/2026-10-17_stock_grouping_unique.sql
+
+-- Clave de agrupación única en inventario_stock para poder añadir stock con
+-- INSERT ... ON CONFLICT DO UPDATE (una sola sentencia, sin carreras).
+-- Antes hay que fusionar los duplicados que ya existan.
+
+BEGIN;
+
+-- 1. Fusionar duplicados: la fila con menor id_stock se queda con la suma
+UPDATE inventario_stock s
+SET cantidad_actual = g.total
+FROM (
+    SELECT MIN(id_stock) AS keep_id, SUM(cantidad_actual) AS total
+    FROM inventario_stock
+    GROUP BY hogar_id, fk_producto_maestro, fk_ubicacion, fecha_caducidad, estado_producto
+    HAVING COUNT(*) > 1
+) g
+WHERE s.id_stock = g.keep_id;
+
+-- 2. Borrar el resto de filas de cada grupo
+DELETE FROM inventario_stock s
+USING inventario_stock k
+WHERE s.hogar_id = k.hogar_id
+  AND s.fk_producto_maestro = k.fk_producto_maestro
+  AND s.fk_ubicacion = k.fk_ubicacion
+  AND s.fecha_caducidad = k.fecha_caducidad
+  AND s.estado_producto = k.estado_producto
+  AND s.id_stock > k.id_stock;
+
+-- 3. Restricción única (su índice es el que usa ON CONFLICT)
+ALTER TABLE inventario_stock
+    ADD CONSTRAINT stock_grouping_unique
+    UNIQUE (hogar_id, fk_producto_maestro, fk_ubicacion, fecha_caducidad, estado_producto);
+
+COMMIT;